@@ -2,3 +2,8 @@
 
 from . import models
 from . import controllers
+
+
+def post_init_hook(env):
+    """Build the receivable aging snapshot of the existing customers once, at install"""
+    env['mobile.receivable.aging']._cron_rebuild()
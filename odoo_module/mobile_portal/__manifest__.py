@@ -35,9 +35,11 @@ This module provides:
         'views/hr_remote_attendance_views.xml',
         'views/hr_employee_document_views.xml',
         'views/purchase_market_price_views.xml',
+        'views/mobile_profiler_views.xml',
         'views/menu_views.xml',
         'data/mobile_portal_data.xml',
     ],
+    'post_init_hook': 'post_init_hook',
     'installable': True,
     'application': True,
     'auto_install': False,
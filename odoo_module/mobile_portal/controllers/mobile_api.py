@@ -1,42 +1,238 @@
 # -*- coding: utf-8 -*-
 
 import base64
-from datetime import datetime, date
+import inspect
+import json
+from datetime import date, datetime, timedelta
+from psycopg2.errors import UniqueViolation
+from werkzeug.routing import Map, Rule
+from werkzeug.exceptions import HTTPException
 from odoo import http, fields
-from odoo.http import request
+from odoo.exceptions import UserError, ValidationError
+from odoo.http import request, Stream
+from odoo.addons.mobile_portal.models.hr_payslip import FINAL_STATES
+from odoo.addons.mobile_portal.tools import metrics
+from odoo.osv import expression
+from odoo.tools import SQL
+
+CREDIT_SORT_FIELDS = (
+    'aging_0_30', 'aging_31_60', 'aging_61_90', 'aging_90_plus',
+    'total_due', 'credit_limit', 'credit_utilization',
+)
+
+BATCH_MAX_CALLS = 50
+
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+PHOTO_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+
+REPLAY_MAX_EVENTS = 200
+
+MARKET_PRICE_IMPORT_MAX_BYTES = 5 * 1024 * 1024
+
+INVOICE_LINES_PAGE_SIZE = 200
+INVOICE_LINE_TYPES = ('product', 'line_section', 'line_note')
+
+UPLOAD_MAX_BYTES = 50 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 512 * 1024
+UPLOAD_CHUNK_MAX_BYTES = 4 * 1024 * 1024
+
+PAYSLIP_PDF_MAX_AGE = 300
+PAYSLIP_PDF_FINAL_MAX_AGE = 30 * 24 * 3600
+
+SYNC_PAGE_SIZE = 500
+# Records committed by transactions still running at sync time carry an
+# earlier write_date, so cursors trail the server clock by this margin
+SYNC_OVERLAP = timedelta(seconds=60)
+
+# Models served by /mobile/api/sync: fields returned, how records are scoped
+# to the current user, and the many2one fields whose name is exposed
+SYNC_MODELS = {
+    'leaves': {
+        'model': 'hr.leave',
+        'fields': ['name', 'holiday_status_id', 'date_from', 'date_to', 'number_of_days',
+                   'state', 'notes', 'create_date'],
+        'scope': 'employee',
+        'names': {'holiday_status_id': 'leave_type_name'},
+    },
+    'payslips': {
+        'model': 'hr.payslip',
+        'fields': ['name', 'number', 'date_from', 'date_to', 'net_wage', 'state', 'struct_id'],
+        'scope': 'employee',
+        'names': {'struct_id': 'struct_name'},
+    },
+    'attendances': {
+        'model': 'hr.remote.attendance',
+        'fields': ['check_in', 'check_out', 'worked_hours', 'latitude', 'longitude', 'state'],
+        'scope': 'employee',
+        'names': {},
+    },
+    'documents': {
+        'model': 'hr.employee.document.request',
+        'fields': ['name', 'document_type_id', 'description', 'state', 'submission_date',
+                   'approval_date', 'rejection_reason'],
+        'scope': 'employee',
+        'names': {'document_type_id': 'document_type_name'},
+    },
+    'tasks': {
+        'model': 'project.task',
+        'fields': ['name', 'project_id', 'stage_id', 'date_deadline', 'priority',
+                   'description', 'progress', 'kanban_state'],
+        'scope': 'user',
+        'names': {'project_id': 'project_name', 'stage_id': 'stage_name'},
+    },
+}
+
+
+
+class BatchCallError(Exception):
+    """A batched route answered with an ``{'error': ...}`` payload instead of raising"""
+
+    def __init__(self, payload):
+        super().__init__(payload['error'])
+        self.payload = payload
 
 
 class MobilePortalController(http.Controller):
     """Mobile Portal API Controller for Flutter App"""
 
+    _batch_route_map = None
+
+    # ==================== Batch ====================
+
+    @http.route('/mobile/api/batch', type='json', auth='user', methods=['POST'])
+    def batch(self, calls, atomic=True):
+        """Execute several mobile API calls in one round trip
+
+        Each call is ``{'path': '/mobile/api/...', 'params': {...}}``. Results
+        are returned in order. With ``atomic`` all calls share the request
+        transaction and the first failure rolls everything back; otherwise
+        each call runs in its own savepoint and failures are isolated.
+        """
+        if not isinstance(calls, list) or len(calls) > BATCH_MAX_CALLS:
+            return {'error': f'calls must be a list of at most {BATCH_MAX_CALLS} items'}
+
+        adapter = self._get_batch_route_map().bind('', '/')
+        results = []
+        failed = False
+        for call in calls:
+            path = call.get('path') if isinstance(call, dict) else None
+            if failed:
+                results.append({'path': path, 'error': 'Skipped: an earlier call failed'})
+                continue
+
+            try:
+                endpoint, path_args = adapter.match(path or '', method='POST')
+                method = getattr(self, endpoint)
+                params = dict(call.get('params') or {}, **path_args)
+                if atomic:
+                    result = self._batch_call(method, params)
+                else:
+                    with request.env.cr.savepoint():
+                        result = self._batch_call(method, params)
+            except Exception as e:
+                if isinstance(e, HTTPException):
+                    error = f'Unknown route: {path}'
+                elif isinstance(e, BatchCallError):
+                    error = e.payload['error']
+                else:
+                    error = str(e)
+                if atomic:
+                    request.env.cr.rollback()
+                    failed = True
+                    # The writes of the calls that succeeded so far are gone
+                    for done in results:
+                        if 'result' in done:
+                            del done['result']
+                            done['error'] = 'Rolled back: a later call failed'
+                results.append({'path': path, 'error': error})
+                continue
+            results.append({'path': path, 'result': result})
+
+        return {
+            'success': not failed,
+            'results': results,
+        }
+
+    def _batch_call(self, method, params):
+        """Run one batch call, raising BatchCallError if the route answered with an error payload"""
+        result = method(**params)
+        if isinstance(result, dict) and 'error' in result:
+            raise BatchCallError(result)
+        return result
+
     # ==================== User & Auth ====================
 
     @http.route('/mobile/api/user/permissions', type='json', auth='user', methods=['POST'])
-    def get_user_permissions(self):
+    def get_user_permissions(self, version=None):
         """Return current user's mobile module permissions"""
-        return request.env['res.users'].get_mobile_permissions()
+        permissions = request.env['res.users'].get_mobile_permissions()
+        return self._versioned_response(
+            permissions, request.env['mobile.reference.data']._get_version(permissions), version,
+        )
 
     @http.route('/mobile/api/user/dashboard', type='json', auth='user', methods=['POST'])
     def get_dashboard_data(self):
         """Return dashboard summary data"""
         return request.env['res.users'].get_mobile_dashboard_data()
 
+    # ==================== Sync ====================
+
+    @http.route('/mobile/api/sync', type='json', auth='user', methods=['POST'])
+    def sync(self, cursors=None, limit=SYNC_PAGE_SIZE):
+        """Return the records changed since the given cursors
+
+        ``cursors`` maps the keys of SYNC_MODELS to the opaque cursor returned
+        by the previous sync, or null for a full download. Each model returns
+        its changed records, the ids of deleted or no longer visible records,
+        a new cursor and whether more changes are pending. ``reset`` tells the
+        client to drop its local copy because the cursor has expired.
+        """
+        if not cursors:
+            cursors = dict.fromkeys(SYNC_MODELS)
+
+        employee = self._get_current_employee()
+        changes = {}
+        for key, cursor in cursors.items():
+            config = SYNC_MODELS.get(key)
+            if not config:
+                changes[key] = {'error': f'Unknown model: {key}'}
+                continue
+
+            if config['scope'] == 'employee':
+                if not employee:
+                    changes[key] = {'error': 'No employee record found'}
+                    continue
+                domain = [('employee_id', '=', employee.id)]
+            else:
+                domain = [('user_ids', 'in', [request.env.user.id])]
+
+            try:
+                since, since_id = self._decode_sync_cursor(cursor)
+            except ValueError:
+                changes[key] = {'error': 'Invalid cursor'}
+                continue
+            changes[key] = self._sync_model(config, domain, since, since_id, limit)
+
+        return {'changes': changes}
+
     # ==================== HR - Payslips ====================
 
     @http.route('/mobile/api/hr/payslips', type='json', auth='user', methods=['POST'])
-    def get_payslips(self, limit=20, offset=0):
+    def get_payslips(self, limit=20, offset=0, cursor=None, count='exact'):
         """Return employee payslips with pagination"""
         employee = self._get_current_employee()
         if not employee:
             return {'error': 'No employee record found for current user'}
 
-        payslips = request.env['hr.payslip'].search_read(
-            [('employee_id', '=', employee.id)],
-            ['name', 'number', 'date_from', 'date_to', 'net_wage', 'state', 'struct_id'],
-            limit=limit,
-            offset=offset,
-            order='date_from desc',
-        )
+        try:
+            records, page = self._paginate(
+                'hr.payslip', [('employee_id', '=', employee.id)], 'date_from desc',
+                limit=limit, offset=offset, cursor=cursor, count=count,
+            )
+        except ValueError as e:
+            return {'error': str(e)}
+        payslips = records.read(['name', 'number', 'date_from', 'date_to', 'net_wage', 'state', 'struct_id'])
 
         for payslip in payslips:
             if payslip.get('struct_id'):
@@ -45,18 +241,17 @@ class MobilePortalController(http.Controller):
             payslip['date_from'] = str(payslip['date_from']) if payslip['date_from'] else None
             payslip['date_to'] = str(payslip['date_to']) if payslip['date_to'] else None
 
-        total = request.env['hr.payslip'].search_count([('employee_id', '=', employee.id)])
-
-        return {
-            'records': payslips,
-            'total': total,
-            'limit': limit,
-            'offset': offset,
-        }
+        return self._records_response(
+            payslips, {'struct_id': 'struct_name'}, limit=limit, offset=offset, **page,
+        )
 
     @http.route('/mobile/api/hr/payslip/<int:payslip_id>/pdf', type='json', auth='user', methods=['POST'])
-    def get_payslip_pdf(self, payslip_id):
-        """Return payslip PDF as base64"""
+    def get_payslip_pdf(self, payslip_id, inline=True):
+        """Return payslip PDF as base64
+
+        With ``inline=False`` only the URL of the streaming download route is
+        returned, which avoids holding the base64 PDF in the JSON body.
+        """
         employee = self._get_current_employee()
         if not employee:
             return {'error': 'No employee record found'}
@@ -65,30 +260,39 @@ class MobilePortalController(http.Controller):
         if not payslip.exists() or payslip.employee_id.id != employee.id:
             return {'error': 'Payslip not found or access denied'}
 
-        # Generate PDF report
-        pdf_content, _ = request.env['ir.actions.report']._render_qweb_pdf(
-            'hr_payroll.action_report_payslip',
-            [payslip_id]
-        )
-
-        return {
-            'filename': f'{payslip.number or payslip.name}.pdf',
-            'content': base64.b64encode(pdf_content).decode('utf-8'),
+        attachment = payslip._get_mobile_pdf_attachment()
+        result = {
+            'filename': attachment.name,
+            'download_url': f'/mobile/api/hr/payslip/{payslip.id}/download',
         }
+        if inline:
+            result['content'] = attachment.datas.decode('utf-8')
+        return result
+
+    @http.route('/mobile/api/hr/payslip/<int:payslip_id>/download', type='http', auth='user', methods=['GET'])
+    def download_payslip_pdf(self, payslip_id):
+        """Stream the payslip PDF with Content-Length, Range and caching headers"""
+        employee = self._get_current_employee()
+        payslip = request.env['hr.payslip'].browse(payslip_id)
+        if not employee or not payslip.exists() or payslip.employee_id.id != employee.id:
+            raise request.not_found()
+
+        attachment = payslip._get_mobile_pdf_attachment()
+        max_age = PAYSLIP_PDF_FINAL_MAX_AGE if payslip.state in FINAL_STATES else PAYSLIP_PDF_MAX_AGE
+        response = Stream.from_attachment(attachment).get_response(as_attachment=True, max_age=max_age)
+        response.headers['Cache-Control'] = f'private, max-age={max_age}'
+        return response
 
     # ==================== HR - Leave Requests ====================
 
     @http.route('/mobile/api/hr/leave/types', type='json', auth='user', methods=['POST'])
-    def get_leave_types(self):
+    def get_leave_types(self, version=None):
         """Return available leave types"""
-        leave_types = request.env['hr.leave.type'].search_read(
-            [('active', '=', True)],
-            ['name', 'request_unit', 'requires_allocation'],
-        )
-        return {'records': leave_types}
+        leave_types, current_version = request.env['mobile.reference.data']._get_reference_data('leave_types')
+        return self._versioned_response({'records': leave_types}, current_version, version)
 
     @http.route('/mobile/api/hr/leaves', type='json', auth='user', methods=['POST'])
-    def get_leaves(self, limit=20, offset=0, state=None):
+    def get_leaves(self, limit=20, offset=0, state=None, cursor=None, count='exact'):
         """Return employee leave requests"""
         employee = self._get_current_employee()
         if not employee:
@@ -98,14 +302,15 @@ class MobilePortalController(http.Controller):
         if state:
             domain.append(('state', '=', state))
 
-        leaves = request.env['hr.leave'].search_read(
-            domain,
-            ['name', 'holiday_status_id', 'date_from', 'date_to', 'number_of_days',
-             'state', 'notes', 'create_date'],
-            limit=limit,
-            offset=offset,
-            order='create_date desc',
-        )
+        try:
+            records, page = self._paginate(
+                'hr.leave', domain, 'create_date desc',
+                limit=limit, offset=offset, cursor=cursor, count=count,
+            )
+        except ValueError as e:
+            return {'error': str(e)}
+        leaves = records.read(['name', 'holiday_status_id', 'date_from', 'date_to', 'number_of_days',
+                               'state', 'notes', 'create_date'])
 
         for leave in leaves:
             if leave.get('holiday_status_id'):
@@ -115,12 +320,7 @@ class MobilePortalController(http.Controller):
             leave['date_to'] = str(leave['date_to']) if leave['date_to'] else None
             leave['create_date'] = str(leave['create_date']) if leave['create_date'] else None
 
-        total = request.env['hr.leave'].search_count(domain)
-
-        return {
-            'records': leaves,
-            'total': total,
-        }
+        return self._records_response(leaves, {'holiday_status_id': 'leave_type_name'}, **page)
 
     @http.route('/mobile/api/hr/leave/create', type='json', auth='user', methods=['POST'])
     def create_leave_request(self, holiday_status_id, date_from, date_to, notes=None):
@@ -150,42 +350,69 @@ class MobilePortalController(http.Controller):
 
     @http.route('/mobile/api/hr/attendance/status', type='json', auth='user', methods=['POST'])
     def get_attendance_status(self):
-        """Return current attendance status"""
+        """Return current attendance status, check-ins and check-outs not yet applied included"""
         employee = self._get_current_employee()
         if not employee:
             return {'error': 'No employee record found'}
 
         # Check for open attendance (checked in but not out)
-        open_attendance = request.env['hr.remote.attendance'].search([
-            ('employee_id', '=', employee.id),
-            ('check_out', '=', False),
-        ], limit=1, order='check_in desc')
+        open_check_in, _event_id = request.env['hr.remote.attendance.stage']._get_open_check_in(employee)
 
-        if open_attendance:
+        if open_check_in:
             return {
                 'checked_in': True,
-                'attendance_id': open_attendance.id,
-                'check_in_time': str(open_attendance.check_in),
-                'latitude': open_attendance.latitude,
-                'longitude': open_attendance.longitude,
+                'attendance_id': open_check_in['attendance_id'],
+                'check_in_time': str(open_check_in['check_in']),
+                'latitude': open_check_in['latitude'],
+                'longitude': open_check_in['longitude'],
+                'pending': open_check_in['pending'],
             }
 
         return {'checked_in': False}
 
     @http.route('/mobile/api/hr/attendance/check_in', type='json', auth='user', methods=['POST'])
-    def remote_check_in(self, latitude, longitude, accuracy, photo_base64=None, device_info=None, is_mock=False):
-        """Record remote attendance check-in"""
+    def remote_check_in(self, latitude, longitude, accuracy, photo_base64=None, device_info=None, is_mock=False,
+                        photo_id=None):
+        """Record remote attendance check-in
+
+        The photo is either inlined as ``photo_base64`` or referenced by the
+        ``photo_id`` returned by /mobile/api/hr/attendance/photo. With the
+        write-behind mode on, a check-in without an inline photo is only
+        staged and acknowledged with its ``event_id``; the attendance is
+        created shortly after by a cron job.
+        """
         employee = self._get_current_employee()
         if not employee:
             return {'error': 'No employee record found'}
 
-        # Check if already checked in
-        open_attendance = request.env['hr.remote.attendance'].search([
-            ('employee_id', '=', employee.id),
-            ('check_out', '=', False),
-        ], limit=1)
+        Attendance = request.env['hr.remote.attendance']
+        photo_upload = Attendance._get_photo_upload(photo_id) if photo_id else None
+        if photo_id and not photo_upload:
+            return {'error': 'Photo upload not found'}
+
+        Stage = request.env['hr.remote.attendance.stage']
+        write_behind = Stage._is_enabled()
+        if not photo_base64 and write_behind:
+            try:
+                event_id, check_in_time, _open_check_in = Stage._stage_event(
+                    employee, 'check_in', latitude, longitude, accuracy,
+                    device_info=device_info, is_mock=is_mock, photo_upload=photo_upload,
+                )
+            except ValidationError as e:
+                return {'error': str(e)}
+            return {
+                'success': True,
+                'attendance_id': False,
+                'event_id': event_id,
+                'pending': True,
+                'check_in_time': str(check_in_time),
+                'message': 'Check-in recorded successfully',
+            }
+        if write_behind:
+            Stage._fold(employee.ids)
 
-        if open_attendance:
+        # Check if already checked in
+        if employee.open_remote_attendance_id:
             return {'error': 'Already checked in. Please check out first.'}
 
         values = {
@@ -199,10 +426,22 @@ class MobilePortalController(http.Controller):
         }
 
         if photo_base64:
-            values['photo'] = photo_base64
+            try:
+                values.update(Attendance._prepare_photo_values('photo', photo_base64))
+            except ValidationError as e:
+                return {'error': str(e)}
+        if photo_base64 or photo_upload:
             values['photo_filename'] = f'checkin_{employee.id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.jpg'
 
-        attendance = request.env['hr.remote.attendance'].create(values)
+        # A concurrent check-in of the same employee trips the unique index on open attendances
+        try:
+            with request.env.cr.savepoint():
+                attendance = Attendance.create(values)
+        except UniqueViolation:
+            return {'error': 'Already checked in. Please check out first.'}
+
+        if photo_upload:
+            attendance._attach_photo_upload(photo_upload, 'photo')
 
         return {
             'success': True,
@@ -212,16 +451,41 @@ class MobilePortalController(http.Controller):
         }
 
     @http.route('/mobile/api/hr/attendance/check_out', type='json', auth='user', methods=['POST'])
-    def remote_check_out(self, latitude, longitude, accuracy, photo_base64=None, device_info=None, is_mock=False):
+    def remote_check_out(self, latitude, longitude, accuracy, photo_base64=None, device_info=None, is_mock=False,
+                         photo_id=None):
         """Record remote attendance check-out"""
         employee = self._get_current_employee()
         if not employee:
             return {'error': 'No employee record found'}
 
-        open_attendance = request.env['hr.remote.attendance'].search([
-            ('employee_id', '=', employee.id),
-            ('check_out', '=', False),
-        ], limit=1, order='check_in desc')
+        Attendance = request.env['hr.remote.attendance']
+        photo_upload = Attendance._get_photo_upload(photo_id) if photo_id else None
+        if photo_id and not photo_upload:
+            return {'error': 'Photo upload not found'}
+
+        Stage = request.env['hr.remote.attendance.stage']
+        write_behind = Stage._is_enabled()
+        if not photo_base64 and write_behind:
+            try:
+                event_id, check_out_time, open_check_in = Stage._stage_event(
+                    employee, 'check_out', latitude, longitude, accuracy,
+                    device_info=device_info, is_mock=is_mock, photo_upload=photo_upload,
+                )
+            except ValidationError as e:
+                return {'error': str(e)}
+            return {
+                'success': True,
+                'attendance_id': open_check_in['attendance_id'],
+                'event_id': event_id,
+                'pending': True,
+                'check_out_time': str(check_out_time),
+                'worked_hours': (check_out_time - open_check_in['check_in']).total_seconds() / 3600.0,
+                'message': 'Check-out recorded successfully',
+            }
+        if write_behind:
+            Stage._fold(employee.ids)
+
+        open_attendance = employee.open_remote_attendance_id
 
         if not open_attendance:
             return {'error': 'No open check-in found. Please check in first.'}
@@ -234,10 +498,16 @@ class MobilePortalController(http.Controller):
         }
 
         if photo_base64:
-            values['checkout_photo'] = photo_base64
+            try:
+                values.update(Attendance._prepare_photo_values('checkout_photo', photo_base64))
+            except ValidationError as e:
+                return {'error': str(e)}
+        if photo_base64 or photo_upload:
             values['checkout_photo_filename'] = f'checkout_{employee.id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.jpg'
 
         open_attendance.write(values)
+        if photo_upload:
+            open_attendance._attach_photo_upload(photo_upload, 'checkout_photo')
 
         return {
             'success': True,
@@ -247,48 +517,112 @@ class MobilePortalController(http.Controller):
             'message': 'Check-out recorded successfully',
         }
 
+    @http.route('/mobile/api/hr/attendance/replay', type='json', auth='user', methods=['POST'])
+    def replay_attendance_events(self, events):
+        """Apply check-in/out events queued while the device was offline
+
+        Each event carries an idempotency ``key``, its ``type`` (check_in or
+        check_out), the device ``timestamp`` in ISO 8601, the GPS fix and an
+        optional ``photo_id``. Replaying the same key again is harmless.
+        """
+        employee = self._get_current_employee()
+        if not employee:
+            return {'error': 'No employee record found'}
+        if not isinstance(events, list) or len(events) > REPLAY_MAX_EVENTS:
+            return {'error': f'events must be a list of at most {REPLAY_MAX_EVENTS} items'}
+
+        outcomes = request.env['hr.remote.attendance']._replay_mobile_events(employee, events)
+        return {
+            'success': all(outcome['status'] != 'error' for outcome in outcomes),
+            'results': outcomes,
+        }
+
+    @http.route('/mobile/api/hr/attendance/photo', type='http', auth='user', methods=['POST'], csrf=False)
+    def upload_attendance_photo(self, **kwargs):
+        """Store an attendance photo sent as a multipart ``photo`` file or as the raw request body
+
+        The photo is downscaled and kept as a pending attachment; the returned
+        ``photo_id`` is then passed to check_in or check_out.
+        """
+        httprequest = request.httprequest
+        if (httprequest.content_length or 0) > PHOTO_UPLOAD_MAX_BYTES:
+            return request.make_json_response({'error': 'Photo is too large'}, status=413)
+
+        # The limit is enforced on the bytes actually read, as chunked
+        # requests carry no Content-Length
+        if httprequest.mimetype == 'multipart/form-data':
+            upload = httprequest.files.get('photo')
+            stream, filename = (upload.stream, upload.filename) if upload else (None, None)
+        else:
+            stream, filename = httprequest.stream, None
+        raw = self._read_bounded(stream, PHOTO_UPLOAD_MAX_BYTES) if stream else b''
+        if raw is None:
+            return request.make_json_response({'error': 'Photo is too large'}, status=413)
+        if not raw:
+            return request.make_json_response({'error': 'No photo received'}, status=400)
+
+        try:
+            attachment = request.env['hr.remote.attendance']._create_photo_upload(raw, filename)
+        except UserError as e:
+            return request.make_json_response({'error': str(e)}, status=400)
+
+        return request.make_json_response({
+            'success': True,
+            'photo_id': attachment.id,
+        })
+
+    def _read_bounded(self, stream, max_bytes):
+        """Read stream in chunks, returning None as soon as it exceeds max_bytes"""
+        chunks = []
+        size = 0
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                return b''.join(chunks)
+            size += len(chunk)
+            if size > max_bytes:
+                return None
+            chunks.append(chunk)
+
     @http.route('/mobile/api/hr/attendance/history', type='json', auth='user', methods=['POST'])
-    def get_attendance_history(self, limit=30, offset=0):
+    def get_attendance_history(self, limit=30, offset=0, cursor=None, count='exact'):
         """Return attendance history"""
         employee = self._get_current_employee()
         if not employee:
             return {'error': 'No employee record found'}
 
-        attendances = request.env['hr.remote.attendance'].search_read(
-            [('employee_id', '=', employee.id)],
-            ['check_in', 'check_out', 'worked_hours', 'latitude', 'longitude', 'state'],
-            limit=limit,
-            offset=offset,
-            order='check_in desc',
-        )
+        try:
+            records, page = self._paginate(
+                'hr.remote.attendance', [('employee_id', '=', employee.id)], 'check_in desc',
+                limit=limit, offset=offset, cursor=cursor, count=count,
+            )
+        except ValueError as e:
+            return {'error': str(e)}
+        attendances = records.read(['check_in', 'check_out', 'worked_hours', 'latitude', 'longitude', 'state'])
 
         for att in attendances:
             att['check_in'] = str(att['check_in']) if att['check_in'] else None
             att['check_out'] = str(att['check_out']) if att['check_out'] else None
 
-        total = request.env['hr.remote.attendance'].search_count([('employee_id', '=', employee.id)])
-
-        return {
-            'records': attendances,
-            'total': total,
-        }
+        return self._records_response(attendances, **page)
 
     # ==================== HR - Documents ====================
 
     @http.route('/mobile/api/hr/documents', type='json', auth='user', methods=['POST'])
-    def get_hr_documents(self, limit=20, offset=0):
+    def get_hr_documents(self, limit=20, offset=0, cursor=None, count='none'):
         """Return HR document requests"""
         employee = self._get_current_employee()
         if not employee:
             return {'error': 'No employee record found'}
 
-        documents = request.env['hr.employee.document.request'].search_read(
-            [('employee_id', '=', employee.id)],
-            ['name', 'document_type_id', 'description', 'state', 'submission_date', 'approval_date', 'rejection_reason'],
-            limit=limit,
-            offset=offset,
-            order='create_date desc',
-        )
+        try:
+            records, page = self._paginate(
+                'hr.employee.document.request', [('employee_id', '=', employee.id)], 'create_date desc',
+                limit=limit, offset=offset, cursor=cursor, count=count,
+            )
+        except ValueError as e:
+            return {'error': str(e)}
+        documents = records.read(['name', 'document_type_id', 'description', 'state', 'submission_date', 'approval_date', 'rejection_reason'])
 
         for doc in documents:
             if doc.get('document_type_id'):
@@ -297,48 +631,63 @@ class MobilePortalController(http.Controller):
             doc['submission_date'] = str(doc['submission_date']) if doc['submission_date'] else None
             doc['approval_date'] = str(doc['approval_date']) if doc['approval_date'] else None
 
-        return {'records': documents}
+        return self._records_response(documents, {'document_type_id': 'document_type_name'}, **page)
 
     @http.route('/mobile/api/hr/document/types', type='json', auth='user', methods=['POST'])
-    def get_document_types(self):
+    def get_document_types(self, version=None):
         """Return available document types"""
-        types = request.env['hr.document.type'].search_read(
-            [],
-            ['name', 'description'],
-        )
-        return {'records': types}
+        types, current_version = request.env['mobile.reference.data']._get_reference_data('document_types')
+        return self._versioned_response({'records': types}, current_version, version)
 
     @http.route('/mobile/api/hr/document/submit', type='json', auth='user', methods=['POST'])
-    def submit_hr_document(self, document_type_id, name, description=None, attachments=None):
-        """Submit HR document request"""
+    def submit_hr_document(self, document_type_id, name, description=None, attachments=None, upload_ids=None):
+        """Submit HR document request
+
+        Files are either inlined in ``attachments`` as base64 or referenced
+        by the ``upload_ids`` of completed chunked uploads.
+        """
         employee = self._get_current_employee()
         if not employee:
             return {'error': 'No employee record found'}
 
-        try:
-            doc = request.env['hr.employee.document.request'].create({
-                'employee_id': employee.id,
-                'document_type_id': document_type_id,
-                'name': name,
-                'description': description,
-            })
+        sessions = request.env['mobile.upload.session']
+        for upload_id in upload_ids or []:
+            session = sessions._get_session(upload_id)
+            if not session:
+                return {'error': f'Upload not found: {upload_id}'}
+            sessions |= session
 
-            # Handle attachments
-            if attachments:
-                attachment_ids = []
-                for att in attachments:
-                    attachment = request.env['ir.attachment'].create({
-                        'name': att.get('filename', 'document'),
-                        'datas': att.get('content'),
-                        'res_model': 'hr.employee.document.request',
-                        'res_id': doc.id,
-                    })
-                    attachment_ids.append(attachment.id)
+        # Check every upload before anything is created, so that an
+        # incomplete or corrupted upload leaves no draft request behind
+        try:
+            upload_vals_list = [session._prepare_attachment_values() for session in sessions]
+        except UserError as e:
+            return {'error': str(e)}
 
-                doc.write({'attachment_ids': [(6, 0, attachment_ids)]})
+        try:
+            with request.env.cr.savepoint():
+                doc = request.env['hr.employee.document.request'].create({
+                    'employee_id': employee.id,
+                    'document_type_id': document_type_id,
+                    'name': name,
+                    'description': description,
+                })
 
-            # Submit the document
-            doc.action_submit()
+                # Handle attachments
+                attachment_vals_list = [{
+                    'name': att.get('filename', 'document'),
+                    'datas': att.get('content'),
+                } for att in attachments or []]
+                attachment_vals_list += upload_vals_list
+                if attachment_vals_list:
+                    for vals in attachment_vals_list:
+                        vals.update(res_model='hr.employee.document.request', res_id=doc.id)
+                    new_attachments = request.env['ir.attachment'].create(attachment_vals_list)
+                    doc.write({'attachment_ids': [(6, 0, new_attachments.ids)]})
+                    sessions._close()
+
+                # Submit the document
+                doc.action_submit()
 
             return {
                 'success': True,
@@ -348,10 +697,68 @@ class MobilePortalController(http.Controller):
         except Exception as e:
             return {'error': str(e)}
 
+    # ==================== Uploads ====================
+
+    @http.route('/mobile/api/upload/begin', type='json', auth='user', methods=['POST'])
+    def begin_upload(self, filename, size, checksum, mimetype=None):
+        """Open a chunked upload session for a file of the given size and SHA-256 checksum"""
+        if not 0 < size <= UPLOAD_MAX_BYTES:
+            return {'error': f'File size must be between 1 byte and {UPLOAD_MAX_BYTES} bytes'}
+
+        session = request.env['mobile.upload.session'].sudo().create({
+            'name': filename,
+            'mimetype': mimetype,
+            'user_id': request.env.uid,
+            'file_size': size,
+            'checksum': checksum,
+        })
+        return {
+            'upload_id': session.token,
+            'offset': 0,
+            'chunk_size': UPLOAD_CHUNK_SIZE,
+        }
+
+    @http.route('/mobile/api/upload/<string:upload_id>/status', type='json', auth='user', methods=['POST'])
+    def get_upload_status(self, upload_id):
+        """Return the offset to resume an upload from"""
+        session = request.env['mobile.upload.session']._get_session(upload_id)
+        if not session:
+            return {'error': 'Upload not found'}
+
+        return {
+            'upload_id': session.token,
+            'offset': session.received_size,
+            'size': session.file_size,
+            'complete': session.received_size == session.file_size,
+        }
+
+    @http.route('/mobile/api/upload/<string:upload_id>/chunk', type='http', auth='user', methods=['POST', 'PUT'], csrf=False)
+    def upload_chunk(self, upload_id, offset=0, **kwargs):
+        """Write the raw request body at offset in an upload session"""
+        session = request.env['mobile.upload.session']._get_session(upload_id)
+        if not session:
+            return request.make_json_response({'error': 'Upload not found'}, status=404)
+
+        length = request.httprequest.content_length
+        if length is None:
+            return request.make_json_response({'error': 'Content-Length is required'}, status=411)
+        if length > UPLOAD_CHUNK_MAX_BYTES:
+            return request.make_json_response({'error': 'Chunk is too large'}, status=413)
+
+        try:
+            session._append_chunk(int(offset), request.httprequest.stream, length)
+        except (UserError, ValueError) as e:
+            return request.make_json_response({'error': str(e), 'offset': session.received_size}, status=409)
+
+        return request.make_json_response({
+            'offset': session.received_size,
+            'complete': session.received_size == session.file_size,
+        })
+
     # ==================== Sales - Invoices ====================
 
     @http.route('/mobile/api/sales/invoices', type='json', auth='user', methods=['POST'])
-    def get_customer_invoices(self, limit=20, offset=0, state=None, partner_id=None):
+    def get_customer_invoices(self, limit=20, offset=0, state=None, partner_id=None, cursor=None, count='exact'):
         """Return customer invoices"""
         domain = [('move_type', '=', 'out_invoice')]
         if state:
@@ -359,14 +766,15 @@ class MobilePortalController(http.Controller):
         if partner_id:
             domain.append(('partner_id', '=', partner_id))
 
-        invoices = request.env['account.move'].search_read(
-            domain,
-            ['name', 'partner_id', 'invoice_date', 'invoice_date_due', 'amount_total',
-             'amount_residual', 'state', 'payment_state'],
-            limit=limit,
-            offset=offset,
-            order='invoice_date desc',
-        )
+        try:
+            records, page = self._paginate(
+                'account.move', domain, 'invoice_date desc',
+                limit=limit, offset=offset, cursor=cursor, count=count,
+            )
+        except ValueError as e:
+            return {'error': str(e)}
+        invoices = records.read(['name', 'partner_id', 'invoice_date', 'invoice_date_due', 'amount_total',
+                                 'amount_residual', 'state', 'payment_state'])
 
         for inv in invoices:
             if inv.get('partner_id'):
@@ -375,32 +783,41 @@ class MobilePortalController(http.Controller):
             inv['invoice_date'] = str(inv['invoice_date']) if inv['invoice_date'] else None
             inv['invoice_date_due'] = str(inv['invoice_date_due']) if inv['invoice_date_due'] else None
 
-        total = request.env['account.move'].search_count(domain)
-
-        return {
-            'records': invoices,
-            'total': total,
-        }
+        return self._records_response(invoices, {'partner_id': 'partner_name'}, **page)
 
     @http.route('/mobile/api/sales/invoice/<int:invoice_id>', type='json', auth='user', methods=['POST'])
-    def get_invoice_detail(self, invoice_id):
-        """Return detailed invoice information"""
+    def get_invoice_detail(self, invoice_id, lines_limit=INVOICE_LINES_PAGE_SIZE, lines_offset=0, summary_only=False):
+        """Return detailed invoice information
+
+        Lines are paged with ``lines_limit``/``lines_offset``, and
+        ``summary_only`` returns the header and line count without lines.
+        """
         invoice = request.env['account.move'].browse(invoice_id)
         if not invoice.exists():
             return {'error': 'Invoice not found'}
 
+        MoveLine = request.env['account.move.line']
+        line_domain = [
+            ('move_id', '=', invoice.id),
+            ('display_type', 'in', INVOICE_LINE_TYPES),
+        ]
+        line_count = MoveLine.search_count(line_domain)
+
         lines = []
-        for line in invoice.invoice_line_ids:
-            lines.append({
-                'id': line.id,
-                'name': line.name,
-                'product_id': line.product_id.id if line.product_id else None,
-                'product_name': line.product_id.display_name if line.product_id else None,
-                'quantity': line.quantity,
-                'price_unit': line.price_unit,
-                'discount': line.discount,
-                'price_subtotal': line.price_subtotal,
-            })
+        lines_next_offset = None
+        if not summary_only:
+            lines = MoveLine.search_read(
+                line_domain,
+                ['name', 'product_id', 'quantity', 'price_unit', 'discount', 'price_subtotal'],
+                limit=lines_limit,
+                offset=lines_offset,
+                order='sequence, id',
+            )
+            for line in lines:
+                line['product_name'] = line['product_id'][1] if line['product_id'] else None
+                line['product_id'] = line['product_id'][0] if line['product_id'] else None
+            if lines_offset + len(lines) < line_count:
+                lines_next_offset = lines_offset + len(lines)
 
         return {
             'id': invoice.id,
@@ -415,153 +832,132 @@ class MobilePortalController(http.Controller):
             'amount_residual': invoice.amount_residual,
             'state': invoice.state,
             'payment_state': invoice.payment_state,
+            'line_count': line_count,
             'lines': lines,
+            'lines_next_offset': lines_next_offset,
         }
 
     # ==================== Sales - Customer Credit ====================
 
     @http.route('/mobile/api/sales/customer/credit', type='json', auth='user', methods=['POST'])
-    def get_customer_credit(self, partner_id=None, limit=20, offset=0):
-        """Return customer credit information with aging"""
-        domain = [('customer_rank', '>', 0)]
+    def get_customer_credit(self, partner_id=None, limit=20, offset=0, order=None, over_credit_limit=None,
+                            cursor=None, count='exact'):
+        """Return customer credit information with aging
+
+        Customers are sorted, filtered and paginated on the stored aging
+        snapshot, e.g. ``order='aging_90_plus desc'`` or ``over_credit_limit=True``.
+        """
+        sort_field, _, direction = (order or 'aging_90_plus desc').partition(' ')
+        if sort_field not in CREDIT_SORT_FIELDS or direction not in ('', 'asc', 'desc'):
+            return {'error': f'Invalid order: {order}'}
+
+        domain = [('company_id', '=', request.env.company.id)]
         if partner_id:
-            domain.append(('id', '=', partner_id))
+            domain.append(('partner_id', '=', partner_id))
+        if over_credit_limit is not None:
+            domain.append(('over_credit_limit', '=', bool(over_credit_limit)))
 
-        partners = request.env['res.partner'].search(domain, limit=limit, offset=offset)
+        Aging = request.env['mobile.receivable.aging']
+        # Build the snapshot of a customer not seen by the refresh jobs yet;
+        # an existing row, whatever its filters, is served as is
+        if partner_id and not Aging.search_count([
+            ('partner_id', '=', partner_id), ('company_id', '=', request.env.company.id),
+        ]):
+            Aging.sudo()._refresh_partners([partner_id])
 
-        result = []
-        for partner in partners:
-            # Get aging data
-            aging = self._calculate_partner_aging(partner.id)
+        try:
+            snapshots, page = self._paginate(
+                'mobile.receivable.aging', domain, f'{sort_field} {direction or "asc"}',
+                limit=limit, offset=offset, cursor=cursor, count=count,
+            )
+        except ValueError as e:
+            return {'error': str(e)}
 
+        result = []
+        for snapshot in snapshots:
+            partner = snapshot.partner_id
             result.append({
                 'id': partner.id,
                 'name': partner.display_name,
-                'credit_limit': partner.credit_limit,
+                'credit_limit': snapshot.credit_limit,
                 'total_receivable': partner.credit,
                 'total_payable': partner.debit,
-                'aging_0_30': aging.get('0_30', 0),
-                'aging_31_60': aging.get('31_60', 0),
-                'aging_61_90': aging.get('61_90', 0),
-                'aging_90_plus': aging.get('90_plus', 0),
+                'total_due': snapshot.total_due,
+                'credit_utilization': snapshot.credit_utilization,
+                'over_credit_limit': snapshot.over_credit_limit,
+                'aging_0_30': snapshot.aging_0_30,
+                'aging_31_60': snapshot.aging_31_60,
+                'aging_61_90': snapshot.aging_61_90,
+                'aging_90_plus': snapshot.aging_90_plus,
+                'refresh_date': str(snapshot.refresh_date) if snapshot.refresh_date else None,
             })
 
-        return {'records': result}
-
-    def _calculate_partner_aging(self, partner_id):
-        """Calculate aging buckets for a partner"""
-        today = date.today()
-        aging = {'0_30': 0, '31_60': 0, '61_90': 0, '90_plus': 0}
-
-        invoices = request.env['account.move'].search([
-            ('partner_id', '=', partner_id),
-            ('move_type', '=', 'out_invoice'),
-            ('state', '=', 'posted'),
-            ('payment_state', 'in', ['not_paid', 'partial']),
-        ])
-
-        for inv in invoices:
-            if not inv.invoice_date_due:
-                continue
-
-            days_due = (today - inv.invoice_date_due).days
-
-            if days_due <= 30:
-                aging['0_30'] += inv.amount_residual
-            elif days_due <= 60:
-                aging['31_60'] += inv.amount_residual
-            elif days_due <= 90:
-                aging['61_90'] += inv.amount_residual
-            else:
-                aging['90_plus'] += inv.amount_residual
-
-        return aging
+        return self._records_response(result, **page)
 
     # ==================== Sales - Products ====================
 
     @http.route('/mobile/api/sales/products', type='json', auth='user', methods=['POST'])
-    def get_products(self, limit=50, offset=0, search=None):
-        """Return product information"""
-        domain = [('sale_ok', '=', True)]
-        if search:
-            domain.append('|')
-            domain.append(('name', 'ilike', search))
-            domain.append(('default_code', 'ilike', search))
+    def get_products(self, limit=50, offset=0, search=None, cursor=None, count='exact'):
+        """Return product information
 
-        products = request.env['product.product'].search_read(
-            domain,
-            ['name', 'default_code', 'list_price', 'qty_available', 'virtual_available', 'uom_id'],
-            limit=limit,
-            offset=offset,
-            order='name',
-        )
+        With ``search`` the products are ranked by relevance and paged by
+        offset; pass ``count='none'`` for search-as-you-type.
+        """
+        domain = [('sale_ok', '=', True)]
+        try:
+            if search and search.strip():
+                records, page = self._search_products(domain, search, limit, offset, count)
+            else:
+                records, page = self._paginate(
+                    'product.product', domain, 'name',
+                    limit=limit, offset=offset, cursor=cursor, count=count,
+                )
+        except ValueError as e:
+            return {'error': str(e)}
+        products = records.read(['name', 'default_code', 'list_price', 'qty_available', 'virtual_available', 'uom_id'])
 
         for prod in products:
             if prod.get('uom_id'):
                 prod['uom_name'] = prod['uom_id'][1]
                 prod['uom_id'] = prod['uom_id'][0]
 
-        total = request.env['product.product'].search_count(domain)
-
-        return {
-            'records': products,
-            'total': total,
-        }
+        return self._records_response(products, {'uom_id': 'uom_name'}, **page)
 
     # ==================== Purchase - Suppliers ====================
 
     @http.route('/mobile/api/purchase/suppliers', type='json', auth='user', methods=['POST'])
-    def get_suppliers(self, limit=20, offset=0, search=None):
+    def get_suppliers(self, limit=20, offset=0, search=None, cursor=None, count='none'):
         """Return supplier information"""
         domain = [('supplier_rank', '>', 0)]
         if search:
             domain.append(('name', 'ilike', search))
 
-        suppliers = request.env['res.partner'].search_read(
-            domain,
-            ['name', 'email', 'phone', 'mobile', 'street', 'city', 'country_id'],
-            limit=limit,
-            offset=offset,
-            order='name',
-        )
+        try:
+            records, page = self._paginate(
+                'res.partner', domain, 'name',
+                limit=limit, offset=offset, cursor=cursor, count=count,
+            )
+        except ValueError as e:
+            return {'error': str(e)}
+        suppliers = records.read(['name', 'email', 'phone', 'mobile', 'street', 'city', 'country_id'])
 
         for supp in suppliers:
             if supp.get('country_id'):
                 supp['country_name'] = supp['country_id'][1]
                 supp['country_id'] = supp['country_id'][0]
 
-        return {'records': suppliers}
+        return self._records_response(suppliers, {'country_id': 'country_name'}, **page)
 
     @http.route('/mobile/api/purchase/supplier/<int:supplier_id>/prices', type='json', auth='user', methods=['POST'])
-    def get_supplier_prices(self, supplier_id, limit=20):
-        """Return last purchase prices from supplier"""
-        # Get from purchase order lines
-        order_lines = request.env['purchase.order.line'].search_read(
-            [
-                ('partner_id', '=', supplier_id),
-                ('order_id.state', 'in', ['purchase', 'done']),
-            ],
-            ['product_id', 'price_unit', 'date_order', 'product_qty', 'product_uom'],
-            limit=limit,
-            order='date_order desc',
-        )
+    def get_supplier_prices(self, supplier_id, limit=20, window_days=90):
+        """Return the last purchase price of the products bought from a supplier
 
-        result = []
-        seen_products = set()
-
-        for line in order_lines:
-            prod_id = line['product_id'][0] if line['product_id'] else None
-            if prod_id and prod_id not in seen_products:
-                seen_products.add(prod_id)
-                result.append({
-                    'product_id': prod_id,
-                    'product_name': line['product_id'][1],
-                    'last_price': line['price_unit'],
-                    'last_qty': line['product_qty'],
-                    'last_date': str(line['date_order']) if line['date_order'] else None,
-                })
-
-        return {'records': result}
+        Each product also carries its min/avg/max price over ``window_days``.
+        """
+        prices = request.env['purchase.order.line']._get_supplier_price_history(
+            supplier_id, limit=limit, window_days=window_days,
+        )
+        return self._records_response(prices, {'product_id': 'product_name', 'uom_id': 'uom_name'})
 
     # ==================== Purchase - Market Prices ====================
 
@@ -585,10 +981,52 @@ class MobilePortalController(http.Controller):
         except Exception as e:
             return {'error': str(e)}
 
+    @http.route('/mobile/api/purchase/market_price/bulk', type='json', auth='user', methods=['POST'])
+    def create_market_prices(self, rows):
+        """Record many market price entries at once, with one result per row"""
+        try:
+            results = request.env['purchase.market.price'].create_bulk_from_mobile(rows)
+        except UserError as e:
+            return {'error': str(e)}
+        return {
+            'success': True,
+            'created': sum(1 for result in results if 'price_id' in result),
+            'results': results,
+        }
+
+    @http.route('/mobile/api/purchase/market_price/import', type='http', auth='user', methods=['POST'], csrf=False)
+    def import_market_prices(self, **kwargs):
+        """Record market price entries from a CSV sent as a multipart ``file`` or as the raw request body"""
+        httprequest = request.httprequest
+        if (httprequest.content_length or 0) > MARKET_PRICE_IMPORT_MAX_BYTES:
+            return request.make_json_response({'error': 'File is too large'}, status=413)
+
+        if httprequest.mimetype == 'multipart/form-data':
+            upload = httprequest.files.get('file')
+            stream = upload.stream if upload else None
+        else:
+            stream = httprequest.stream
+        raw = self._read_bounded(stream, MARKET_PRICE_IMPORT_MAX_BYTES) if stream else b''
+        if raw is None:
+            return request.make_json_response({'error': 'File is too large'}, status=413)
+        try:
+            MarketPrice = request.env['purchase.market.price']
+            results = MarketPrice.create_bulk_from_mobile(MarketPrice.parse_bulk_csv(raw.decode('utf-8-sig')))
+        except UnicodeDecodeError:
+            return request.make_json_response({'error': 'The file must be UTF-8 encoded'}, status=400)
+        except UserError as e:
+            return request.make_json_response({'error': str(e)}, status=400)
+
+        return request.make_json_response({
+            'success': True,
+            'created': sum(1 for result in results if 'price_id' in result),
+            'results': results,
+        })
+
     # ==================== Project - Job Orders ====================
 
     @http.route('/mobile/api/project/tasks', type='json', auth='user', methods=['POST'])
-    def get_project_tasks(self, limit=20, offset=0, project_id=None, stage_id=None):
+    def get_project_tasks(self, limit=20, offset=0, project_id=None, stage_id=None, cursor=None, count='exact'):
         """Return assigned project tasks"""
         user = request.env.user
         domain = [('user_ids', 'in', [user.id])]
@@ -598,14 +1036,15 @@ class MobilePortalController(http.Controller):
         if stage_id:
             domain.append(('stage_id', '=', stage_id))
 
-        tasks = request.env['project.task'].search_read(
-            domain,
-            ['name', 'project_id', 'stage_id', 'date_deadline', 'priority',
-             'description', 'progress', 'kanban_state'],
-            limit=limit,
-            offset=offset,
-            order='date_deadline asc, priority desc',
-        )
+        try:
+            records, page = self._paginate(
+                'project.task', domain, 'date_deadline asc, priority desc',
+                limit=limit, offset=offset, cursor=cursor, count=count,
+            )
+        except ValueError as e:
+            return {'error': str(e)}
+        tasks = records.read(['name', 'project_id', 'stage_id', 'date_deadline', 'priority',
+                              'description', 'progress', 'kanban_state'])
 
         for task in tasks:
             if task.get('project_id'):
@@ -616,12 +1055,7 @@ class MobilePortalController(http.Controller):
                 task['stage_id'] = task['stage_id'][0]
             task['date_deadline'] = str(task['date_deadline']) if task['date_deadline'] else None
 
-        total = request.env['project.task'].search_count(domain)
-
-        return {
-            'records': tasks,
-            'total': total,
-        }
+        return self._records_response(tasks, {'project_id': 'project_name', 'stage_id': 'stage_name'}, **page)
 
     @http.route('/mobile/api/project/task/<int:task_id>', type='json', auth='user', methods=['POST'])
     def get_task_detail(self, task_id):
@@ -679,24 +1113,290 @@ class MobilePortalController(http.Controller):
         }
 
     @http.route('/mobile/api/project/stages', type='json', auth='user', methods=['POST'])
-    def get_project_stages(self, project_id=None):
+    def get_project_stages(self, project_id=None, version=None):
         """Return project stages"""
-        domain = []
-        if project_id:
-            domain.append(('project_ids', 'in', [project_id]))
+        stages, current_version = request.env['mobile.reference.data']._get_reference_data(
+            'project_stages', project_id or None,
+        )
+        return self._versioned_response({'records': stages}, current_version, version)
+
+    # ==================== Metrics ====================
+
+    @http.route('/mobile/metrics', type='http', auth='user', methods=['GET'])
+    def get_metrics(self):
+        """Expose the per-route metrics of this worker in the Prometheus text format"""
+        if not request.env.user._is_system():
+            raise request.not_found()
+        return request.make_response(metrics.exposition(), headers=[
+            ('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+            ('Cache-Control', 'no-store'),
+        ])
 
-        stages = request.env['project.task.type'].search_read(
+    # ==================== Helper Methods ====================
+
+    def _records_response(self, records, names=None, **extra):
+        """Return a list of record dicts, in the format requested by the client
+
+        By default records are returned as is under ``records``. Clients that
+        send ``X-Mobile-Format: columnar`` get the keys once in ``columns``,
+        each record as an array in ``rows``, and the names of referenced
+        records once per id in ``names``, instead of in every row. ``names``
+        maps each id key to the key holding its name, e.g.
+        ``{'partner_id': 'partner_name'}``.
+        """
+        if request.httprequest.headers.get('X-Mobile-Format') != 'columnar':
+            return {'records': records, **extra}
+
+        names = names or {}
+        name_keys = set(names.values())
+        columns = [key for key in records[0] if key not in name_keys] if records else []
+        lookup = {field_name: {} for field_name in names}
+        for record in records:
+            for field_name, name_key in names.items():
+                if record.get(field_name):
+                    lookup[field_name][record[field_name]] = record.get(name_key)
+        return {
+            'format': 'columnar',
+            'columns': columns,
+            'rows': [[record.get(column) for column in columns] for record in records],
+            'names': lookup,
+            **extra,
+        }
+
+    def _versioned_response(self, payload, current_version, client_version=None):
+        """Return payload tagged with its version, or a bare "not modified"
+        reply when the client already holds that version
+
+        The version is also sent as an ETag and matched against If-None-Match.
+        """
+        etag = f'"{current_version}"'
+        request.future_response.headers['ETag'] = etag
+        if client_version == current_version or request.httprequest.headers.get('If-None-Match') == etag:
+            return {'not_modified': True, 'version': current_version}
+        return dict(payload, version=current_version)
+
+    def _paginate(self, model_name, domain, order, limit=20, offset=0, cursor=None, count='exact'):
+        """Return one page of records matching domain and its pagination info
+
+        Pages are fetched by keyset on the order keys (plus id) when a cursor
+        from a previous page is given, and by offset otherwise. ``count`` is
+        ``'exact'``, ``'estimate'`` (from the planner statistics) or ``'none'``.
+        Raises ValueError on an invalid cursor or count mode.
+        """
+        if count not in COUNT_MODES:
+            raise ValueError(f'Invalid count mode: {count}')
+
+        Model = request.env[model_name]
+        keys = self._parse_order(order)
+        search_domain = domain
+        if cursor:
+            values = self._decode_cursor(cursor)
+            if len(values) != len(keys):
+                raise ValueError('Invalid cursor')
+            search_domain = expression.AND([domain, self._keyset_domain(keys, values)])
+            offset = 0
+
+        records = Model.search(
+            search_domain,
+            limit=limit + 1,
+            offset=offset,
+            order=', '.join(f'{field_name} {direction}' for field_name, direction in keys),
+        )
+        has_more = len(records) > limit
+        records = records[:limit]
+
+        next_cursor = None
+        if has_more:
+            next_cursor = self._encode_cursor([records[-1][field_name] for field_name, _direction in keys])
+
+        total_estimated = False
+        if count == 'none':
+            total = None
+        elif not cursor and not has_more:
+            total = offset + len(records)
+        elif count == 'estimate':
+            total = self._estimate_count(Model, domain)
+            total_estimated = True
+        else:
+            total = Model.search_count(domain)
+
+        return records, {
+            'total': total,
+            'total_estimated': total_estimated,
+            'next_cursor': next_cursor,
+        }
+
+    def _search_products(self, domain, search, limit=50, offset=0, count='exact'):
+        """Return one page of products matching search by relevance and its pagination info
+
+        Relevance ranking has no stable keys to build a cursor from, so the
+        page info carries ``next_offset`` instead of ``next_cursor``.
+        """
+        if count not in COUNT_MODES:
+            raise ValueError(f'Invalid count mode: {count}')
+
+        Product = request.env['product.product']
+        records, has_more, match_domain = Product._search_mobile(search, domain, limit=limit, offset=offset)
+
+        total_estimated = False
+        if count == 'none':
+            total = None
+        elif not has_more:
+            total = offset + len(records)
+        elif count == 'estimate':
+            total = self._estimate_count(Product, match_domain)
+            total_estimated = True
+        else:
+            total = Product.search_count(match_domain)
+
+        return records, {
+            'total': total,
+            'total_estimated': total_estimated,
+            'next_cursor': None,
+            'next_offset': offset + len(records) if has_more else None,
+        }
+
+    def _parse_order(self, order):
+        """Return [(field_name, direction)] of an order spec, ending with id"""
+        keys = []
+        for part in order.split(','):
+            field_name, _, direction = part.strip().partition(' ')
+            keys.append((field_name, direction.strip().lower() or 'asc'))
+        if keys[-1][0] != 'id':
+            keys.append(('id', keys[-1][1]))
+        return keys
+
+    def _keyset_domain(self, keys, values):
+        """Return the domain of the records sorted strictly after the given key values
+
+        Follows the PostgreSQL default of NULLS LAST for ascending and NULLS
+        FIRST for descending keys, which is what the ORM emits.
+        """
+        branches = []
+        equal = []
+        for (field_name, direction), value in zip(keys, values):
+            if value is None:
+                after = [(field_name, '!=', False)] if direction == 'desc' else expression.FALSE_DOMAIN
+            elif direction == 'desc':
+                after = [(field_name, '<', value)]
+            else:
+                after = expression.OR([[(field_name, '>', value)], [(field_name, '=', False)]])
+            branches.append(expression.AND(equal + [after]))
+            equal.append([(field_name, '=', False if value is None else value)])
+        return expression.OR(branches)
+
+    def _estimate_count(self, Model, domain):
+        """Return the planner's row estimate for domain instead of counting"""
+        query = Model._search(domain)
+        request.env.cr.execute(SQL("EXPLAIN (FORMAT JSON) %s", query.select()))
+        return int(request.env.cr.fetchone()[0][0]['Plan']['Plan Rows'])
+
+    def _encode_cursor(self, values):
+        """Return an opaque cursor holding the given key values
+
+        Datetimes keep their microseconds: rows created in one transaction
+        share a create_date that a second-precision key could not tell
+        apart from its neighbours.
+        """
+        payload = [
+            {'datetime': value.isoformat()} if isinstance(value, datetime)
+            else fields.Date.to_string(value) if isinstance(value, date)
+            else None if value is False
+            else value
+            for value in values
+        ]
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def _decode_cursor(self, cursor):
+        """Return the key values held by a cursor, raising ValueError if it is malformed"""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list):
+                raise ValueError('Invalid cursor')
+            return [
+                datetime.fromisoformat(value['datetime']) if isinstance(value, dict) else value
+                for value in values
+            ]
+        except (TypeError, ValueError, AttributeError, KeyError) as e:
+            raise ValueError('Invalid cursor') from e
+
+    def _sync_model(self, config, domain, since, since_id, limit):
+        """Return one page of changes of a SYNC_MODELS entry after (since, since_id)"""
+        Tombstone = request.env['mobile.sync.tombstone']
+        reset = bool(since) and since < Tombstone._get_retention_start()
+        if reset:
+            since, since_id = None, 0
+
+        # Compare on (write_date, id) at full precision, so that records
+        # sharing a write_date are neither repeated nor stuck on a page boundary
+        if since:
+            domain = domain + [
+                '|', ('write_date', '>', since),
+                '&', ('write_date', '=', since), ('id', '>', since_id),
+            ]
+
+        records = request.env[config['model']].search_read(
             domain,
-            ['name', 'sequence', 'fold'],
-            order='sequence',
+            config['fields'] + ['write_date'],
+            limit=limit + 1,
+            order='write_date, id',
+        )
+        has_more = len(records) > limit
+        records = records[:limit]
+
+        if has_more:
+            next_cursor = (records[-1]['write_date'], records[-1]['id'])
+        else:
+            safe_point = request.env.cr.now() - SYNC_OVERLAP
+            next_cursor = (safe_point, 0) if not since or safe_point > since else (since, since_id)
+
+        for record in records:
+            for field_name, name_key in config['names'].items():
+                if record.get(field_name):
+                    record[name_key] = record[field_name][1]
+                    record[field_name] = record[field_name][0]
+            for field_name, value in record.items():
+                if isinstance(value, (date, datetime)):
+                    record[field_name] = str(value)
+
+        # Tombstones follow the same cursor: each page sends those logged
+        # between the previous cursor and the next one, once
+        return self._records_response(
+            records, config['names'],
+            deleted_ids=Tombstone._get_deleted_ids(config['model'], since, next_cursor[0]) if since else [],
+            cursor=self._encode_sync_cursor(*next_cursor),
+            has_more=has_more,
+            reset=reset,
         )
 
-        return {'records': stages}
+    def _encode_sync_cursor(self, write_date, record_id):
+        return self._encode_cursor([write_date, record_id])
 
-    # ==================== Helper Methods ====================
+    def _decode_sync_cursor(self, cursor):
+        """Return the (write_date, id) position encoded in a sync cursor"""
+        if not cursor:
+            return None, 0
+        try:
+            write_date, record_id = self._decode_cursor(cursor)
+            if not isinstance(write_date, datetime):
+                write_date = fields.Datetime.to_datetime(write_date)
+            return write_date, int(record_id)
+        except (TypeError, ValueError) as e:
+            raise ValueError('Invalid cursor') from e
+
+    @classmethod
+    def _get_batch_route_map(cls):
+        """Map the JSON routes of this controller to their method names"""
+        if cls.__dict__.get('_batch_route_map') is None:
+            rules = []
+            for name, member in inspect.getmembers(cls, callable):
+                routing = getattr(member, 'original_routing', None)
+                if not routing or routing.get('type') != 'json' or name == 'batch':
+                    continue
+                rules.extend(Rule(route, endpoint=name) for route in routing['routes'])
+            cls._batch_route_map = Map(rules)
+        return cls._batch_route_map
 
     def _get_current_employee(self):
         """Get employee record for current user"""
-        return request.env['hr.employee'].search([
-            ('user_id', '=', request.env.user.id)
-        ], limit=1)
+        return request.env['hr.employee']._get_current_employee()
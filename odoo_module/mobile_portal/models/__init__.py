@@ -1,6 +1,22 @@
 # -*- coding: utf-8 -*-
 
+from . import mobile_sync
+from . import mobile_reference_data
+from . import mobile_dashboard_summary
 from . import hr_remote_attendance
+from . import hr_remote_attendance_stage
 from . import hr_employee_document
 from . import purchase_market_price
+from . import product_product
+from . import purchase_order_line
 from . import res_users
+from . import hr_employee
+from . import hr_payslip
+from . import hr_leave
+from . import project_task
+from . import res_partner
+from . import account_move
+from . import mobile_receivable_aging
+from . import mobile_upload_session
+from . import mobile_profiler
+from . import ir_http
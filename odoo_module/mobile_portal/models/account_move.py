@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    def _post(self, soft=True):
+        posted = super()._post(soft=soft)
+        posted._mobile_receivables_changed()
+        return posted
+
+    def button_draft(self):
+        res = super().button_draft()
+        self._mobile_receivables_changed()
+        return res
+
+    def button_cancel(self):
+        res = super().button_cancel()
+        self._mobile_receivables_changed()
+        return res
+
+    def _mobile_receivables_changed(self):
+        """Refresh the aging snapshot of these invoices' customers"""
+        invoices = self.filtered(lambda move: move.move_type == 'out_invoice')
+        if invoices:
+            self.env['mobile.receivable.aging']._schedule_refresh(invoices.partner_id.ids)
+
+
+class AccountPartialReconcile(models.Model):
+    _inherit = 'account.partial.reconcile'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        partials = super().create(vals_list)
+        partials._mobile_receivables_changed()
+        return partials
+
+    def unlink(self):
+        self._mobile_receivables_changed()
+        return super().unlink()
+
+    def _mobile_receivables_changed(self):
+        """Propagate the payment of the reconciled invoices to the mobile receivables data"""
+        moves = (self.debit_move_id | self.credit_move_id).move_id
+        moves._mobile_receivables_changed()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, tools
+
+EMPLOYEE_CACHE_FIELDS = {'user_id', 'active', 'company_id'}
+
+
+class HrEmployee(models.Model):
+    _inherit = 'hr.employee'
+
+    open_remote_attendance_id = fields.Many2one(
+        'hr.remote.attendance',
+        string='Open Remote Attendance',
+        readonly=True,
+        copy=False,
+        help='Remote attendance checked in but not yet checked out',
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        employees = super().create(vals_list)
+        if any(vals.get('user_id') for vals in vals_list):
+            self.env.registry.clear_cache()
+        return employees
+
+    def write(self, vals):
+        res = super().write(vals)
+        if EMPLOYEE_CACHE_FIELDS & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    def _get_current_employee(self):
+        """Return the employee linked to the current user"""
+        return self.browse(self._get_current_employee_id())
+
+    @api.model
+    @tools.ormcache('self.env.uid', 'self.env.su', 'tuple(self.env.companies.ids)')
+    def _get_current_employee_id(self):
+        return self.search([('user_id', '=', self.env.uid)], limit=1).id
@@ -33,7 +33,7 @@ class HrEmployeeDocumentRequest(models.Model):
     _name = 'hr.employee.document.request'
     _description = 'HR Document Request'
     _order = 'create_date desc'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'mobile.sync.mixin']
 
     name = fields.Char(
         string='Document Name',
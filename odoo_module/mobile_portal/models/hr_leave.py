@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+
+class HrLeave(models.Model):
+    _name = 'hr.leave'
+    _inherit = ['hr.leave', 'mobile.sync.mixin']
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        leaves = super().create(vals_list)
+        leaves._mark_mobile_dashboard_stale()
+        return leaves
+
+    def write(self, vals):
+        if 'state' not in vals and 'employee_id' not in vals:
+            return super().write(vals)
+        self._mark_mobile_dashboard_stale()
+        res = super().write(vals)
+        self._mark_mobile_dashboard_stale()
+        return res
+
+    def unlink(self):
+        self._mark_mobile_dashboard_stale()
+        return super().unlink()
+
+    def _mark_mobile_dashboard_stale(self):
+        self.env['mobile.dashboard.summary']._mark_stale(user_ids=self.employee_id.user_id.ids)
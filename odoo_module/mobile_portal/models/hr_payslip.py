@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+PDF_CACHE_PREFIX = 'mobile_portal.payslip_pdf:'
+FINAL_STATES = ('done', 'paid')
+
+
+class HrPayslip(models.Model):
+    _name = 'hr.payslip'
+    _inherit = ['hr.payslip', 'mobile.sync.mixin']
+
+    def _get_mobile_pdf_attachment(self):
+        """Return the attachment holding the rendered PDF of this payslip
+
+        The PDF is rendered once per write_date and kept as an attachment;
+        payslips in a final state are rendered only once.
+        """
+        self.ensure_one()
+        Attachment = self.env['ir.attachment'].sudo()
+        cached = Attachment.search([
+            ('res_model', '=', self._name),
+            ('res_id', '=', self.id),
+            ('description', '=like', f'{PDF_CACHE_PREFIX}%'),
+        ], order='id desc')
+
+        final = self.state in FINAL_STATES
+        cache_key = PDF_CACHE_PREFIX + ('final' if final else fields.Datetime.to_string(self.write_date))
+        current = cached.filtered(lambda attachment: attachment.description == cache_key)[:1]
+        if current:
+            return current
+
+        pdf_content, _ = self.env['ir.actions.report']._render_qweb_pdf(
+            'hr_payroll.action_report_payslip',
+            [self.id]
+        )
+        cached.unlink()
+        return Attachment.create({
+            'name': f'{self.number or self.name}.pdf',
+            'raw': pdf_content,
+            'mimetype': 'application/pdf',
+            'res_model': self._name,
+            'res_id': self.id,
+            'description': cache_key,
+        })
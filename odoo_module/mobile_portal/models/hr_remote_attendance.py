@@ -1,14 +1,38 @@
 # -*- coding: utf-8 -*-
 
+import base64
+import binascii
+import logging
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+
 from odoo import models, fields, api
-from odoo.exceptions import ValidationError
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools.image import image_process
+from odoo.tools.sql import index_exists
+from odoo.addons.mobile_portal.tools.profiler import profiled
+
+_logger = logging.getLogger(__name__)
+
+PHOTO_MAX_SIZE = (1280, 1280)
+PHOTO_THUMBNAIL_SIZE = (256, 256)
+PHOTO_QUALITY = 80
+PHOTO_UPLOAD_TAG = 'mobile_portal.photo_upload'
+PHOTO_UPLOAD_LIFETIME = timedelta(days=1)
+
+# Offline events older than this, or ahead of the server clock by more than
+# the skew, are rejected when replayed
+REPLAY_MAX_AGE = timedelta(days=7)
+REPLAY_MAX_CLOCK_SKEW = timedelta(minutes=5)
+REPLAY_EVENT_TYPES = ('check_in', 'check_out')
 
 
 class HrRemoteAttendance(models.Model):
     _name = 'hr.remote.attendance'
     _description = 'Remote Attendance'
     _order = 'check_in desc'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'mobile.sync.mixin']
 
     employee_id = fields.Many2one(
         'hr.employee',
@@ -86,12 +110,108 @@ class HrRemoteAttendance(models.Model):
     checkout_photo_filename = fields.Char(
         string='Checkout Photo Filename',
     )
+    photo_thumbnail = fields.Binary(
+        string='Photo Thumbnail',
+        attachment=True,
+    )
+    checkout_photo_thumbnail = fields.Binary(
+        string='Checkout Photo Thumbnail',
+        attachment=True,
+    )
     company_id = fields.Many2one(
         'res.company',
         string='Company',
         related='employee_id.company_id',
         store=True,
     )
+    recorded_offline = fields.Boolean(
+        string='Recorded Offline',
+        default=False,
+        help='Replayed from the offline queue of the mobile app with device timestamps',
+    )
+    check_in_key = fields.Char(
+        string='Check In Idempotency Key',
+        copy=False,
+    )
+    check_out_key = fields.Char(
+        string='Check Out Idempotency Key',
+        copy=False,
+    )
+
+    _sql_constraints = [
+        ('check_in_key_uniq', 'unique(employee_id, check_in_key)',
+         'This check-in has already been recorded.'),
+        ('check_out_key_uniq', 'unique(employee_id, check_out_key)',
+         'This check-out has already been recorded.'),
+    ]
+
+    def init(self):
+        index_name = 'hr_remote_attendance_open_employee_uniq'
+        if not index_exists(self._cr, index_name):
+            try:
+                with self._cr.savepoint(flush=False):
+                    self._cr.execute(f"""
+                        CREATE UNIQUE INDEX {index_name}
+                            ON hr_remote_attendance (employee_id)
+                         WHERE check_out IS NULL
+                    """)
+            except psycopg2.errors.UniqueViolation:
+                _logger.warning(
+                    "Some employees have several open remote attendances; "
+                    "check them out and update the module to enforce a single open attendance."
+                )
+        self._cr.execute("""
+            UPDATE hr_employee emp
+               SET open_remote_attendance_id = att.id
+              FROM hr_remote_attendance att
+             WHERE att.employee_id = emp.id
+               AND att.check_out IS NULL
+               AND emp.open_remote_attendance_id IS DISTINCT FROM att.id
+        """)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        attendances = super().create(vals_list)
+        attendances._update_employee_open_attendance(attendances.employee_id.ids)
+        return attendances
+
+    def write(self, vals):
+        if 'check_out' not in vals and 'employee_id' not in vals:
+            return super().write(vals)
+        employee_ids = set(self.employee_id.ids)
+        res = super().write(vals)
+        self._update_employee_open_attendance(list(employee_ids | set(self.employee_id.ids)))
+        return res
+
+    def unlink(self):
+        employee_ids = self.employee_id.ids
+        res = super().unlink()
+        self._update_employee_open_attendance(employee_ids)
+        return res
+
+    @api.model
+    def _update_employee_open_attendance(self, employee_ids):
+        """Point each employee to their open attendance, if any
+
+        The pointer is written in SQL so that employees without write access
+        on their own hr.employee record can still check in and out.
+        """
+        if not employee_ids:
+            return
+        self.flush_model(['employee_id', 'check_out'])
+        self.env.cr.execute("""
+            UPDATE hr_employee emp
+               SET open_remote_attendance_id = (
+                       SELECT att.id
+                         FROM hr_remote_attendance att
+                        WHERE att.employee_id = emp.id
+                          AND att.check_out IS NULL
+                     ORDER BY att.check_in DESC
+                        LIMIT 1
+                   )
+             WHERE emp.id IN %s
+        """, [tuple(employee_ids)])
+        self.env['hr.employee'].invalidate_model(['open_remote_attendance_id'])
 
     @api.depends('check_in', 'check_out')
     def _compute_worked_hours(self):
@@ -127,6 +247,7 @@ class HrRemoteAttendance(models.Model):
         self.write({'state': 'draft'})
 
     @api.model
+    @profiled
     def create_from_mobile(self, employee_id, latitude, longitude, accuracy, photo_base64, device_info, is_mock, is_checkout=False):
         """Create attendance record from mobile app"""
         import base64
@@ -134,6 +255,9 @@ class HrRemoteAttendance(models.Model):
         employee = self.env['hr.employee'].browse(employee_id)
         if not employee.exists():
             raise ValidationError('Employee not found')
+        Stage = self.env['hr.remote.attendance.stage']
+        if Stage._is_enabled():
+            Stage._fold(employee.ids)
 
         values = {
             'employee_id': employee_id,
@@ -145,16 +269,11 @@ class HrRemoteAttendance(models.Model):
         }
 
         if photo_base64:
-            values['photo'] = photo_base64
+            values.update(self._prepare_photo_values('photo', photo_base64))
             values['photo_filename'] = f'attendance_{employee_id}_{fields.Datetime.now()}.jpg'
 
+        open_attendance = employee.open_remote_attendance_id
         if is_checkout:
-            # Find open attendance
-            open_attendance = self.search([
-                ('employee_id', '=', employee_id),
-                ('check_out', '=', False),
-            ], limit=1, order='check_in desc')
-
             if open_attendance:
                 open_attendance.write({
                     'check_out': fields.Datetime.now(),
@@ -165,5 +284,206 @@ class HrRemoteAttendance(models.Model):
             else:
                 raise ValidationError('No open attendance record found')
         else:
+            if open_attendance:
+                raise ValidationError('Already checked in. Please check out first.')
             values['check_in'] = fields.Datetime.now()
             return self.create(values).id
+
+    # ==================== Offline Replay ====================
+
+    @api.model
+    def _replay_mobile_events(self, employee, events):
+        """Apply check-in/out events queued offline by the mobile app
+
+        Events are ``{'key', 'type', 'timestamp', 'latitude', 'longitude',
+        'accuracy', 'photo_id', 'device_info', 'is_mock'}``, applied in
+        timestamp order, each in its own savepoint, after the staged events
+        of the employee. An event whose key was already applied is reported
+        as a duplicate instead of being applied again. Returns one outcome
+        per event, in the order received.
+        """
+        Stage = self.env['hr.remote.attendance.stage']
+        if Stage._is_enabled():
+            Stage._fold(employee.ids)
+        keys = [event.get('key') for event in events if isinstance(event, dict) and event.get('key')]
+        applied = {}
+        if keys:
+            for attendance in self.search_read([
+                ('employee_id', '=', employee.id),
+                '|', ('check_in_key', 'in', keys), ('check_out_key', 'in', keys),
+            ], ['check_in_key', 'check_out_key']):
+                for key_field in ('check_in_key', 'check_out_key'):
+                    if attendance[key_field]:
+                        applied[attendance[key_field]] = attendance['id']
+
+        outcomes = [None] * len(events)
+        pending = []
+        for index, event in enumerate(events):
+            try:
+                if not isinstance(event, dict) or not event.get('key'):
+                    raise ValidationError('Missing idempotency key')
+                if event.get('type') not in REPLAY_EVENT_TYPES:
+                    raise ValidationError(f"Unknown event type {event.get('type')}")
+                timestamp = self._parse_device_timestamp(event.get('timestamp'))
+            except ValidationError as e:
+                outcomes[index] = {'key': event.get('key') if isinstance(event, dict) else None,
+                                   'status': 'error', 'error': str(e)}
+                continue
+            pending.append((timestamp, index, event))
+
+        for timestamp, index, event in sorted(pending, key=lambda item: item[:2]):
+            key = event['key']
+            if key in applied:
+                outcomes[index] = {'key': key, 'status': 'duplicate', 'attendance_id': applied[key]}
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    attendance = self._replay_mobile_event(employee, event, timestamp)
+            except (ValidationError, psycopg2.errors.UniqueViolation) as e:
+                error = 'Already recorded' if isinstance(e, psycopg2.errors.UniqueViolation) else str(e)
+                outcomes[index] = {'key': key, 'status': 'error', 'error': error}
+                continue
+            applied[key] = attendance.id
+            outcomes[index] = {'key': key, 'status': 'applied', 'attendance_id': attendance.id}
+        return outcomes
+
+    @api.model
+    def _replay_mobile_event(self, employee, event, timestamp):
+        photo_upload = None
+        if event.get('photo_id'):
+            photo_upload = self._get_photo_upload(event['photo_id'])
+            if not photo_upload:
+                raise ValidationError('Photo upload not found')
+
+        open_attendance = employee.open_remote_attendance_id
+        if event['type'] == 'check_in':
+            if open_attendance:
+                raise ValidationError('Already checked in. Please check out first.')
+            attendance = self.create({
+                'employee_id': employee.id,
+                'check_in': timestamp,
+                'latitude': event.get('latitude'),
+                'longitude': event.get('longitude'),
+                'gps_accuracy': event.get('accuracy'),
+                'device_info': event.get('device_info'),
+                'is_mock_location': bool(event.get('is_mock')),
+                'recorded_offline': True,
+                'check_in_key': event['key'],
+                'photo_filename': photo_upload and f'checkin_{employee.id}_{timestamp:%Y%m%d_%H%M%S}.jpg',
+            })
+            photo_field = 'photo'
+        else:
+            if not open_attendance:
+                raise ValidationError('No open check-in found. Please check in first.')
+            if timestamp < open_attendance.check_in:
+                raise ValidationError('Check Out time cannot be before Check In time.')
+            attendance = open_attendance
+            attendance.write({
+                'check_out': timestamp,
+                'checkout_latitude': event.get('latitude'),
+                'checkout_longitude': event.get('longitude'),
+                'checkout_accuracy': event.get('accuracy'),
+                'recorded_offline': True,
+                'check_out_key': event['key'],
+                'checkout_photo_filename': photo_upload and f'checkout_{employee.id}_{timestamp:%Y%m%d_%H%M%S}.jpg',
+            })
+            photo_field = 'checkout_photo'
+
+        if photo_upload:
+            attendance._attach_photo_upload(photo_upload, photo_field)
+        return attendance
+
+    @api.model
+    def _parse_device_timestamp(self, value):
+        """Return an ISO 8601 device timestamp as a naive UTC datetime, checked against the server clock"""
+        try:
+            # Python < 3.11 does not accept the Z suffix produced by toIso8601String()
+            if value.endswith(('Z', 'z')):
+                value = value[:-1] + '+00:00'
+            timestamp = datetime.fromisoformat(value)
+        except (AttributeError, TypeError, ValueError):
+            raise ValidationError(f'Invalid timestamp {value}')
+        if timestamp.tzinfo:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        timestamp = timestamp.replace(microsecond=0)
+
+        now = fields.Datetime.now()
+        if timestamp > now + REPLAY_MAX_CLOCK_SKEW:
+            raise ValidationError('Timestamp is in the future')
+        if timestamp < now - REPLAY_MAX_AGE:
+            raise ValidationError('Timestamp is too old to be replayed')
+        return timestamp
+
+    # ==================== Photos ====================
+
+    @api.model
+    def _process_photo(self, raw):
+        """Return (photo, thumbnail) as JPEG bytes bounded in resolution and quality"""
+        photo = image_process(raw, size=PHOTO_MAX_SIZE, quality=PHOTO_QUALITY, output_format='JPEG')
+        thumbnail = image_process(photo, size=PHOTO_THUMBNAIL_SIZE, quality=PHOTO_QUALITY, output_format='JPEG')
+        return photo, thumbnail
+
+    @api.model
+    def _prepare_photo_values(self, field_name, photo_base64):
+        """Return the values of a photo field and its thumbnail from a base64 image
+
+        Raises ValidationError if the value is not a base64-encoded image.
+        """
+        try:
+            photo, thumbnail = self._process_photo(base64.b64decode(photo_base64))
+        except (binascii.Error, ValueError, TypeError, UserError) as e:
+            raise ValidationError('Invalid photo') from e
+        return {
+            field_name: base64.b64encode(photo),
+            f'{field_name}_thumbnail': base64.b64encode(thumbnail),
+        }
+
+    @api.model
+    def _create_photo_upload(self, raw, filename=None):
+        """Store a downscaled photo uploaded ahead of a check-in or check-out"""
+        photo = image_process(raw, size=PHOTO_MAX_SIZE, quality=PHOTO_QUALITY, output_format='JPEG')
+        return self.env['ir.attachment'].sudo().create({
+            'name': filename or f'upload_{self.env.uid}_{fields.Datetime.now()}.jpg',
+            'raw': photo,
+            'mimetype': 'image/jpeg',
+            'res_model': self._name,
+            'res_id': 0,
+            'description': PHOTO_UPLOAD_TAG,
+        })
+
+    @api.model
+    def _get_photo_upload(self, upload_id):
+        """Return the pending photo upload of the current user with the given id"""
+        upload = self.env['ir.attachment'].sudo().browse(upload_id).exists()
+        if (upload.description != PHOTO_UPLOAD_TAG or upload.res_id
+                or upload.res_model != self._name or upload.create_uid.id != self.env.uid):
+            return self.env['ir.attachment']
+        return upload
+
+    def _attach_photo_upload(self, upload, field_name):
+        """Use an uploaded photo as the value of field_name without copying it"""
+        self.ensure_one()
+        thumbnail = image_process(upload.raw, size=PHOTO_THUMBNAIL_SIZE, quality=PHOTO_QUALITY, output_format='JPEG')
+        self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', field_name),
+            ('res_id', '=', self.id),
+        ]).unlink()
+        upload.write({
+            'name': field_name,
+            'res_field': field_name,
+            'res_id': self.id,
+            'description': False,
+        })
+        self.invalidate_recordset([field_name])
+        self.write({f'{field_name}_thumbnail': base64.b64encode(thumbnail)})
+
+    @api.autovacuum
+    def _gc_photo_uploads(self):
+        """Drop photo uploads never used by a check-in or check-out"""
+        self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_id', '=', 0),
+            ('description', '=', PHOTO_UPLOAD_TAG),
+            ('create_date', '<', fields.Datetime.now() - PHOTO_UPLOAD_LIFETIME),
+        ]).unlink()
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from psycopg2.errors import UniqueViolation
+
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+from odoo.tools import SQL, str2bool
+
+_logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_PARAM = 'mobile_portal.attendance_write_behind'
+STAGE_FOLD_BATCH_SIZE = 2000
+
+
+class HrRemoteAttendanceStage(models.Model):
+    """Check-in/out events acknowledged to the mobile app but not yet applied
+
+    Rows are appended with a single insert and folded into
+    hr.remote.attendance in batches by a cron job. Events that cannot be
+    applied are kept as rejected for HR to review.
+    """
+    _name = 'hr.remote.attendance.stage'
+    _description = 'Staged Remote Attendance Event'
+    _order = 'id'
+    _log_access = False
+
+    employee_id = fields.Many2one(
+        'hr.employee',
+        string='Employee',
+        required=True,
+        ondelete='cascade',
+    )
+    event_type = fields.Selection([
+        ('check_in', 'Check In'),
+        ('check_out', 'Check Out'),
+    ], string='Event', required=True)
+    timestamp = fields.Datetime(
+        string='Timestamp',
+        required=True,
+    )
+    latitude = fields.Float(
+        string='Latitude',
+        digits=(10, 7),
+    )
+    longitude = fields.Float(
+        string='Longitude',
+        digits=(10, 7),
+    )
+    accuracy = fields.Float(
+        string='GPS Accuracy (meters)',
+    )
+    device_info = fields.Char(
+        string='Device Info',
+    )
+    is_mock = fields.Boolean(
+        string='Mock Location Detected',
+    )
+    photo_id = fields.Many2one(
+        'ir.attachment',
+        string='Photo Upload',
+        ondelete='set null',
+    )
+    previous_id = fields.Integer(
+        string='Previous Event',
+        help='Pending event of the same employee this one follows, 0 for the first one',
+    )
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('rejected', 'Rejected'),
+    ], string='Status', default='pending', required=True)
+    error = fields.Char(
+        string='Rejection Reason',
+    )
+
+    def init(self):
+        # Two requests of the same employee racing to append after the same
+        # pending event trip this index instead of both being acknowledged
+        self._cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS hr_remote_attendance_stage_pending_previous_uniq
+                ON hr_remote_attendance_stage (employee_id, previous_id)
+             WHERE state = 'pending'
+        """)
+
+    @api.model
+    def _is_enabled(self):
+        return str2bool(self.env['ir.config_parameter'].sudo().get_param(WRITE_BEHIND_PARAM, 'False'))
+
+    @api.model
+    def _get_open_check_in(self, employee):
+        """Return the open check-in of an employee, staged events included, and the last staged event id
+
+        The open check-in is ``{'attendance_id', 'check_in', 'latitude',
+        'longitude', 'pending'}``, with no attendance_id while it is only
+        staged, or None if the employee is checked out.
+        """
+        self.env.cr.execute("""
+            SELECT id, event_type, timestamp, latitude, longitude
+              FROM hr_remote_attendance_stage
+             WHERE employee_id = %s
+               AND state = 'pending'
+          ORDER BY id DESC
+             LIMIT 1
+        """, [employee.id])
+        row = self.env.cr.fetchone()
+        if row:
+            event_id, event_type, timestamp, latitude, longitude = row
+            if event_type == 'check_out':
+                return None, event_id
+            return {
+                'attendance_id': False,
+                'check_in': timestamp,
+                'latitude': latitude,
+                'longitude': longitude,
+                'pending': True,
+            }, event_id
+
+        open_attendance = employee.open_remote_attendance_id
+        if not open_attendance:
+            return None, 0
+        return {
+            'attendance_id': open_attendance.id,
+            'check_in': open_attendance.check_in,
+            'latitude': open_attendance.latitude,
+            'longitude': open_attendance.longitude,
+            'pending': False,
+        }, 0
+
+    @api.model
+    def _stage_event(self, employee, event_type, latitude, longitude, accuracy,
+                     device_info=None, is_mock=False, photo_upload=None):
+        """Append a check-in/out event for the employee and return ``(event_id, timestamp, open_check_in)``
+
+        open_check_in is the check-in the event follows, as returned by
+        _get_open_check_in. The photo, if any, must be a pending upload of
+        the current user.
+        """
+        open_check_in, previous_id = self._get_open_check_in(employee)
+        if event_type == 'check_in' and open_check_in:
+            raise ValidationError('Already checked in. Please check out first.')
+        if event_type == 'check_out' and not open_check_in:
+            raise ValidationError('No open check-in found. Please check in first.')
+
+        timestamp = fields.Datetime.now()
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute("""
+                    INSERT INTO hr_remote_attendance_stage
+                           (employee_id, event_type, timestamp, latitude, longitude, accuracy,
+                            device_info, is_mock, photo_id, previous_id, state)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'pending')
+                 RETURNING id
+                """, [
+                    employee.id, event_type, timestamp, latitude, longitude, accuracy,
+                    device_info, bool(is_mock), photo_upload.id if photo_upload else None, previous_id,
+                ])
+        except UniqueViolation:
+            raise ValidationError('Another check-in or check-out is being recorded. Please retry.')
+        return self.env.cr.fetchone()[0], timestamp, open_check_in
+
+    @api.model
+    def _fold(self, employee_ids=None, limit=None):
+        """Apply pending staged events to hr.remote.attendance, oldest first, and delete them
+
+        Events that no longer apply, like a second check-in staged while a
+        previous batch was being folded, are kept as rejected with the
+        reason, since the app was already told they were recorded. Returns
+        the number of pending events consumed.
+        """
+        self.env.cr.execute(SQL("""
+            SELECT id, employee_id, event_type, timestamp, latitude, longitude,
+                   accuracy, device_info, is_mock, photo_id
+              FROM hr_remote_attendance_stage
+             WHERE state = 'pending'
+                   %s
+          ORDER BY id
+                   %s
+               FOR UPDATE
+        """,
+            SQL("AND employee_id IN %s", tuple(employee_ids)) if employee_ids else SQL(),
+            SQL("LIMIT %s", limit) if limit else SQL(),
+        ))
+        rows = self.env.cr.dictfetchall()
+        if not rows:
+            return 0
+
+        Attendance = self.env['hr.remote.attendance'].sudo().with_context(tracking_disable=True)
+        employees = self.env['hr.employee'].sudo().browse({row['employee_id'] for row in rows})
+        # Open attendance per employee: a record, the values of one created
+        # in this batch, or None once checked out
+        open_attendances = {employee.id: employee.open_remote_attendance_id or None for employee in employees}
+        creates, writes, rejected = [], [], {}
+        for row in rows:
+            employee_id, timestamp = row['employee_id'], row['timestamp']
+            current = open_attendances[employee_id]
+            if row['event_type'] == 'check_in':
+                if current is not None:
+                    rejected[row['id']] = 'Already checked in'
+                    continue
+                values = {
+                    'employee_id': employee_id,
+                    'check_in': timestamp,
+                    'latitude': row['latitude'],
+                    'longitude': row['longitude'],
+                    'gps_accuracy': row['accuracy'],
+                    'device_info': row['device_info'],
+                    'is_mock_location': row['is_mock'],
+                }
+                photos = {}
+                if row['photo_id']:
+                    values['photo_filename'] = f'checkin_{employee_id}_{timestamp:%Y%m%d_%H%M%S}.jpg'
+                    photos['photo'] = row['photo_id']
+                creates.append((values, photos))
+                open_attendances[employee_id] = (values, photos)
+                continue
+
+            if current is None:
+                rejected[row['id']] = 'No open check-in'
+                continue
+            values = {
+                'check_out': timestamp,
+                'checkout_latitude': row['latitude'],
+                'checkout_longitude': row['longitude'],
+                'checkout_accuracy': row['accuracy'],
+            }
+            photos = {}
+            if row['photo_id']:
+                values['checkout_photo_filename'] = f'checkout_{employee_id}_{timestamp:%Y%m%d_%H%M%S}.jpg'
+                photos['checkout_photo'] = row['photo_id']
+            if isinstance(current, tuple):
+                current[0].update(values)
+                current[1].update(photos)
+            else:
+                writes.append((current, values, photos))
+            open_attendances[employee_id] = None
+
+        # Close the attendances already in the database first, so that the
+        # employees checking in again do not trip the unique open index
+        attach = []
+        for attendance, values, photos in writes:
+            attendance.with_context(tracking_disable=True).write(values)
+            attach.append((attendance, photos))
+        if creates:
+            attendances = Attendance.create([values for values, _photos in creates])
+            attach += zip(attendances, [photos for _values, photos in creates])
+
+        uploads = {upload.id: upload for upload in self.env['ir.attachment'].sudo().browse(
+            {upload_id for _attendance, photos in attach for upload_id in photos.values()}
+        ).exists()}
+        for attendance, photos in attach:
+            for field_name, upload_id in photos.items():
+                upload = uploads.get(upload_id)
+                if upload and not upload.res_id:
+                    attendance._attach_photo_upload(upload, field_name)
+
+        applied_ids = tuple(row['id'] for row in rows if row['id'] not in rejected)
+        if applied_ids:
+            self.env.cr.execute("DELETE FROM hr_remote_attendance_stage WHERE id IN %s", [applied_ids])
+        if rejected:
+            self.env.cr.execute(SQL("""
+                UPDATE hr_remote_attendance_stage stage
+                   SET state = 'rejected', error = rejection.error
+                  FROM (VALUES %s) AS rejection(id, error)
+                 WHERE stage.id = rejection.id
+            """, SQL(", ").join(SQL("(%s, %s)", event_id, error) for event_id, error in rejected.items())))
+            _logger.warning("Rejected %s staged attendance events that no longer applied", len(rejected))
+        self.invalidate_model()
+        return len(rows)
+
+    @api.model
+    def _cron_fold(self):
+        """Fold the staged events in batches until the stage is empty"""
+        while self._fold(limit=STAGE_FOLD_BATCH_SIZE) == STAGE_FOLD_BATCH_SIZE:
+            self.env.cr.commit()
+            self.env.invalidate_all()
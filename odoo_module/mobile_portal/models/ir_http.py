@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import threading
+import time
+
+from odoo import models
+from odoo.http import request
+from odoo.addons.mobile_portal.tools import metrics
+
+MOBILE_API_PREFIX = '/mobile/api/'
+# Smaller bodies fit in a packet or two and are not worth compressing
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+
+class IrHttp(models.AbstractModel):
+    _inherit = 'ir.http'
+
+    @classmethod
+    def _dispatch(cls, endpoint):
+        routes = getattr(endpoint, 'routing', {}).get('routes')
+        if not routes or not request.httprequest.path.startswith(MOBILE_API_PREFIX):
+            return super()._dispatch(endpoint)
+
+        thread = threading.current_thread()
+        request._mobile_metrics = {
+            'route': routes[0],
+            'start': time.perf_counter(),
+            'query_count': getattr(thread, 'query_count', 0),
+            'query_time': getattr(thread, 'query_time', 0.0),
+            'error': False,
+        }
+        try:
+            result = request.env['mobile.profiler.rule']._run_profiled(routes[0], super()._dispatch, endpoint)
+        except Exception:
+            request._mobile_metrics['error'] = True
+            cls._record_mobile_metrics(response_size=0)
+            raise
+        if isinstance(result, dict) and 'error' in result:
+            request._mobile_metrics['error'] = True
+        return result
+
+    @classmethod
+    def _post_dispatch(cls, response):
+        super()._post_dispatch(response)
+        if request.httprequest.path.startswith(MOBILE_API_PREFIX):
+            cls._gzip_mobile_response(response)
+        if getattr(request, '_mobile_metrics', None):
+            if response.status_code >= 400:
+                request._mobile_metrics['error'] = True
+            cls._record_mobile_metrics(
+                response_size=response.content_length or (
+                    0 if response.is_streamed or response.direct_passthrough else len(response.get_data())
+                ),
+            )
+
+    @classmethod
+    def _record_mobile_metrics(cls, response_size):
+        """Add the measures of the current mobile API request to the in-process metrics"""
+        measures, request._mobile_metrics = request._mobile_metrics, None
+        thread = threading.current_thread()
+        metrics.record(
+            measures['route'],
+            duration=time.perf_counter() - measures['start'],
+            sql_queries=getattr(thread, 'query_count', 0) - measures['query_count'],
+            sql_duration=getattr(thread, 'query_time', 0.0) - measures['query_time'],
+            request_size=request.httprequest.content_length or 0,
+            response_size=response_size,
+            error=measures['error'],
+        )
+
+    @classmethod
+    def _gzip_mobile_response(cls, response):
+        """Compress a buffered mobile API response for clients accepting gzip"""
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code != 200
+                or 'Content-Encoding' in response.headers
+                or not request.httprequest.accept_encodings['gzip']):
+            return
+        data = response.get_data()
+        if len(data) < GZIP_MIN_BYTES:
+            return
+        response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+DASHBOARD_SUMMARY_TTL = timedelta(minutes=10)
+DASHBOARD_COUNTERS = ('pending_leaves', 'open_invoices', 'active_tasks')
+
+
+class MobileDashboardSummary(models.Model):
+    _name = 'mobile.dashboard.summary'
+    _description = 'Mobile Dashboard Counters'
+    _rec_name = 'user_id'
+
+    user_id = fields.Many2one(
+        'res.users',
+        string='User',
+        required=True,
+        ondelete='cascade',
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        required=True,
+        ondelete='cascade',
+    )
+    pending_leaves = fields.Integer(
+        string='Pending Leaves',
+    )
+    open_invoices = fields.Integer(
+        string='Open Invoices',
+    )
+    active_tasks = fields.Integer(
+        string='Active Tasks',
+    )
+    stale = fields.Boolean(
+        string='Stale',
+        default=False,
+    )
+    refresh_date = fields.Datetime(
+        string='Last Refresh',
+    )
+
+    _sql_constraints = [
+        ('user_company_uniq', 'unique(user_id, company_id)',
+         'Only one dashboard summary per user and company is allowed.'),
+    ]
+
+    @api.model
+    def _get_counters(self, employee):
+        """Return the dashboard counters of the current user in the current company
+
+        Counters are read from the summary row in one indexed query and only
+        recomputed when the row is missing, marked stale or older than the TTL.
+        Counters the user has no access to are None.
+        """
+        self.env.cr.execute("""
+            SELECT pending_leaves, open_invoices, active_tasks
+              FROM mobile_dashboard_summary
+             WHERE user_id = %s
+               AND company_id = %s
+               AND NOT stale
+               AND refresh_date > %s
+        """, [self.env.uid, self.env.company.id, fields.Datetime.now() - DASHBOARD_SUMMARY_TTL])
+        row = self.env.cr.fetchone()
+        if row:
+            return dict(zip(DASHBOARD_COUNTERS, row))
+
+        counters = self._compute_counters(employee)
+        self.env.cr.execute("""
+            INSERT INTO mobile_dashboard_summary (
+                user_id, company_id, pending_leaves, open_invoices, active_tasks,
+                stale, refresh_date, create_uid, create_date, write_uid, write_date
+            ) VALUES (%(user_id)s, %(company_id)s, %(pending_leaves)s, %(open_invoices)s, %(active_tasks)s,
+                      FALSE, %(now)s, %(user_id)s, %(now)s, %(user_id)s, %(now)s)
+            ON CONFLICT (user_id, company_id) DO UPDATE SET
+                pending_leaves = EXCLUDED.pending_leaves,
+                open_invoices = EXCLUDED.open_invoices,
+                active_tasks = EXCLUDED.active_tasks,
+                stale = FALSE,
+                refresh_date = EXCLUDED.refresh_date,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """, dict(counters, user_id=self.env.uid, company_id=self.env.company.id, now=fields.Datetime.now()))
+        self.invalidate_model()
+        return counters
+
+    @api.model
+    def _compute_counters(self, employee):
+        user = self.env.user
+        counters = dict.fromkeys(DASHBOARD_COUNTERS)
+
+        # HR Summary
+        if employee and user.mobile_hr_access:
+            counters['pending_leaves'] = self.env['hr.leave'].search_count([
+                ('employee_id', '=', employee.id),
+                ('state', '=', 'confirm'),
+            ])
+
+        # Sales Summary
+        if user.mobile_sales_access:
+            counters['open_invoices'] = self.env['account.move'].search_count([
+                ('move_type', '=', 'out_invoice'),
+                ('state', '=', 'posted'),
+                ('payment_state', 'in', ['not_paid', 'partial']),
+            ])
+
+        # Project Summary
+        if user.mobile_project_access:
+            counters['active_tasks'] = self.env['project.task'].search_count([
+                ('user_ids', 'in', [user.id]),
+                ('stage_id.fold', '=', False),
+            ])
+
+        return counters
+
+    @api.model
+    def _mark_stale(self, user_ids):
+        """Flag the summaries of the given users for recomputation
+
+        Company-wide counters like open_invoices are not invalidated on each
+        posting or payment, which would rewrite every summary of the company
+        on the accounting hot path; they follow the TTL instead.
+        """
+        if user_ids:
+            self.env.cr.execute(
+                "UPDATE mobile_dashboard_summary SET stale = TRUE WHERE user_id IN %s AND NOT stale",
+                [tuple(user_ids)],
+            )
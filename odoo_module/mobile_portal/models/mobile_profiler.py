@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+import base64
+from datetime import timedelta
+
+from odoo import models, fields, api, tools
+from odoo.addons.mobile_portal.tools.profiler import Capture, is_capturing
+
+PROFILE_RETENTION = timedelta(days=14)
+
+
+class MobileProfilerRule(models.Model):
+    _name = 'mobile.profiler.rule'
+    _description = 'Mobile Slow Request Profiling Rule'
+    _order = 'route, user_id'
+
+    name = fields.Char(
+        string='Description',
+    )
+    route = fields.Char(
+        string='Route or Method',
+        help='Route template such as /mobile/api/hr/leaves, or model method such as '
+             'purchase.market.price.get_latest_prices. Leave empty to profile everything.',
+    )
+    user_id = fields.Many2one(
+        'res.users',
+        string='User',
+        ondelete='cascade',
+        help='Leave empty to profile the requests of every user',
+    )
+    threshold_ms = fields.Integer(
+        string='Threshold (ms)',
+        default=500,
+        required=True,
+        help='Only calls slower than this are stored',
+    )
+    active = fields.Boolean(
+        string='Active',
+        default=True,
+    )
+
+    @api.model
+    def _get_generation(self):
+        """Return a value that changes whenever a rule is created, written or deleted"""
+        self.env.cr.execute("SELECT count(*), max(write_date) FROM mobile_profiler_rule")
+        count, last_write = self.env.cr.fetchone()
+        return count, last_write and last_write.isoformat()
+
+    @api.model
+    @tools.ormcache('generation')
+    def _get_rules(self, generation):
+        return tuple(
+            (rule.route or False, rule.user_id.id, rule.threshold_ms)
+            for rule in self.sudo().search([])
+        )
+
+    @api.model
+    def _get_threshold(self, key):
+        """Return the threshold in ms above which calls of key by the current
+        user are stored, or None when they are not profiled"""
+        thresholds = [
+            threshold for route, user_id, threshold in self._get_rules(self._get_generation())
+            if route in (False, key) and user_id in (False, self.env.uid)
+        ]
+        return min(thresholds, default=None)
+
+    @api.model
+    def _run_profiled(self, key, func, *args, **kwargs):
+        """Call func, profiling it when a rule matches key and the current user
+
+        Without matching rule, or inside a call already being profiled, func
+        is called directly.
+        """
+        threshold = None if is_capturing() else self._get_threshold(key)
+        if threshold is None:
+            return func(*args, **kwargs)
+
+        capture = Capture()
+        try:
+            with capture:
+                return func(*args, **kwargs)
+        finally:
+            if capture.duration * 1000 >= threshold:
+                self.env['mobile.profile']._store(key, capture)
+
+
+class MobileProfile(models.Model):
+    _name = 'mobile.profile'
+    _description = 'Mobile Slow Request Profile'
+    _order = 'create_date desc'
+    _rec_name = 'route'
+
+    route = fields.Char(
+        string='Route or Method',
+        required=True,
+        readonly=True,
+    )
+    user_id = fields.Many2one(
+        'res.users',
+        string='User',
+        ondelete='cascade',
+        readonly=True,
+    )
+    duration_ms = fields.Float(
+        string='Duration (ms)',
+        digits=(16, 1),
+        readonly=True,
+    )
+    sql_count = fields.Integer(
+        string='SQL Queries',
+        readonly=True,
+    )
+    sql_time_ms = fields.Float(
+        string='SQL Time (ms)',
+        digits=(16, 1),
+        readonly=True,
+    )
+    sql_trace = fields.Text(
+        string='SQL Trace',
+        readonly=True,
+    )
+    profile_file = fields.Binary(
+        string='cProfile Dump',
+        attachment=True,
+        readonly=True,
+    )
+    profile_filename = fields.Char(
+        string='Profile Filename',
+    )
+
+    @api.model
+    def _store(self, key, capture):
+        """Save a capture in its own transaction, so that it survives a rollback of the profiled request"""
+        now = fields.Datetime.now()
+        with self.env.registry.cursor() as cr:
+            self.env(cr=cr, su=True)[self._name].create({
+                'route': key,
+                'user_id': self.env.uid,
+                'duration_ms': capture.duration * 1000,
+                'sql_count': capture.query_count,
+                'sql_time_ms': capture.query_time * 1000,
+                'sql_trace': capture.get_sql_trace(),
+                'profile_file': base64.b64encode(capture.get_prof()),
+                'profile_filename': f'{key.strip("/").replace("/", "_")}_{now:%Y%m%d_%H%M%S}.prof',
+            })
+
+    @api.autovacuum
+    def _gc_profiles(self):
+        self.sudo().search([('create_date', '<', fields.Datetime.now() - PROFILE_RETENTION)]).unlink()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from psycopg2.extras import execute_values
+
+from odoo import models, fields, api
+from odoo.tools import split_every
+
+SNAPSHOT_INSERT = """
+    INSERT INTO mobile_receivable_aging (
+        partner_id, company_id,
+        aging_0_30, aging_31_60, aging_61_90, aging_90_plus,
+        total_due, credit_limit, credit_utilization, over_credit_limit,
+        refresh_date, create_uid, create_date, write_uid, write_date
+    ) VALUES %s
+"""
+
+
+class MobileReceivableAging(models.Model):
+    _name = 'mobile.receivable.aging'
+    _description = 'Customer Receivable Aging Snapshot'
+    _order = 'aging_90_plus desc, id'
+    _rec_name = 'partner_id'
+
+    partner_id = fields.Many2one(
+        'res.partner',
+        string='Customer',
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        required=True,
+        ondelete='cascade',
+    )
+    aging_0_30 = fields.Float(
+        string='0-30 Days',
+        index=True,
+    )
+    aging_31_60 = fields.Float(
+        string='31-60 Days',
+        index=True,
+    )
+    aging_61_90 = fields.Float(
+        string='61-90 Days',
+        index=True,
+    )
+    aging_90_plus = fields.Float(
+        string='90+ Days',
+        index=True,
+    )
+    total_due = fields.Float(
+        string='Total Due',
+        index=True,
+        help='Residual amount of all open customer invoices',
+    )
+    credit_limit = fields.Float(
+        string='Credit Limit',
+    )
+    credit_utilization = fields.Float(
+        string='Credit Utilization (%)',
+        index=True,
+        help='Total due as a percentage of the credit limit',
+    )
+    over_credit_limit = fields.Boolean(
+        string='Over Credit Limit',
+        index=True,
+    )
+    refresh_date = fields.Datetime(
+        string='Last Refresh',
+    )
+
+    _sql_constraints = [
+        ('partner_company_uniq', 'unique(partner_id, company_id)',
+         'Only one aging snapshot per customer and company is allowed.'),
+    ]
+
+    @api.model
+    def _schedule_refresh(self, partner_ids):
+        """Refresh the snapshot of the given partners before the transaction commits
+
+        Partners touched several times in the same transaction are refreshed
+        only once, after all invoices and reconciliations have been written.
+        """
+        partner_ids = {partner_id for partner_id in partner_ids if partner_id}
+        if not partner_ids:
+            return
+        pending = self.env.cr.precommit.data.setdefault('mobile_portal.aging_partner_ids', set())
+        if not pending:
+            self.env.cr.precommit.add(self._run_scheduled_refresh)
+        pending.update(partner_ids)
+
+    def _run_scheduled_refresh(self):
+        partner_ids = self.env.cr.precommit.data.pop('mobile_portal.aging_partner_ids', set())
+        self.sudo()._refresh_partners(partner_ids)
+
+    @api.model
+    def _refresh_partners(self, partner_ids, today=None):
+        """Recompute and upsert the snapshot rows of the given customers
+
+        Every customer gets a row in each company it is visible in, so that
+        customers without invoices are listed with their credit limit. The
+        aging is only recomputed for the companies where a customer has
+        posted invoices or an amount due; elsewhere its row is a zero row,
+        inserted once and then only rewritten when its credit limit changes.
+        """
+        today = today or date.today()
+        now = fields.Datetime.now()
+        Partner = self.env['res.partner'].sudo()
+        companies = self.env['res.company'].sudo().search([])
+
+        for batch_ids in split_every(1000, list(partner_ids)):
+            customers = Partner.search([('id', 'in', list(batch_ids)), ('customer_rank', '>', 0)])
+            if not customers:
+                continue
+
+            self.flush_model()
+            self.env['account.move'].flush_model(['partner_id', 'company_id', 'move_type', 'state'])
+            self.env.cr.execute("""
+                SELECT DISTINCT partner_id, company_id
+                  FROM account_move
+                 WHERE partner_id IN %(partner_ids)s
+                   AND move_type = 'out_invoice'
+                   AND state = 'posted'
+                 UNION
+                SELECT partner_id, company_id
+                  FROM mobile_receivable_aging
+                 WHERE partner_id IN %(partner_ids)s
+                   AND total_due <> 0
+            """, {'partner_ids': tuple(customers.ids)})
+            aged_pairs = set(self.env.cr.fetchall())
+
+            rows, zero_rows = [], []
+            for company in companies:
+                company_customers = customers.filtered(
+                    lambda partner: (partner.id, company.id) in aged_pairs
+                    or not partner.company_id or partner.company_id == company
+                )
+                aged_ids = [partner.id for partner in company_customers if (partner.id, company.id) in aged_pairs]
+                aging_by_partner = Partner._get_receivable_aging(aged_ids, today, company.ids)
+                for partner in company_customers.with_company(company):
+                    credit_limit = partner.credit_limit
+                    if partner.id not in aging_by_partner:
+                        zero_rows.append((
+                            partner.id, company.id, 0.0, 0.0, 0.0, 0.0, 0.0, credit_limit, 0.0, False,
+                            now, self.env.uid, now, self.env.uid, now,
+                        ))
+                        continue
+                    aging = aging_by_partner[partner.id]
+                    total_due = sum(aging.values())
+                    rows.append((
+                        partner.id, company.id,
+                        aging['0_30'], aging['31_60'], aging['61_90'], aging['90_plus'],
+                        total_due, credit_limit,
+                        total_due / credit_limit * 100 if credit_limit else 0.0,
+                        bool(credit_limit) and total_due > credit_limit,
+                        now, self.env.uid, now, self.env.uid, now,
+                    ))
+
+            if rows:
+                execute_values(self.env.cr._obj, f"""
+                    {SNAPSHOT_INSERT}
+                    ON CONFLICT (partner_id, company_id) DO UPDATE SET
+                        aging_0_30 = EXCLUDED.aging_0_30,
+                        aging_31_60 = EXCLUDED.aging_31_60,
+                        aging_61_90 = EXCLUDED.aging_61_90,
+                        aging_90_plus = EXCLUDED.aging_90_plus,
+                        total_due = EXCLUDED.total_due,
+                        credit_limit = EXCLUDED.credit_limit,
+                        credit_utilization = EXCLUDED.credit_utilization,
+                        over_credit_limit = EXCLUDED.over_credit_limit,
+                        refresh_date = EXCLUDED.refresh_date,
+                        write_uid = EXCLUDED.write_uid,
+                        write_date = EXCLUDED.write_date
+                """, rows)
+            if zero_rows:
+                execute_values(self.env.cr._obj, f"""
+                    {SNAPSHOT_INSERT}
+                    ON CONFLICT (partner_id, company_id) DO UPDATE SET
+                        credit_limit = EXCLUDED.credit_limit,
+                        refresh_date = EXCLUDED.refresh_date,
+                        write_uid = EXCLUDED.write_uid,
+                        write_date = EXCLUDED.write_date
+                    WHERE mobile_receivable_aging.credit_limit IS DISTINCT FROM EXCLUDED.credit_limit
+                """, zero_rows)
+        self.invalidate_model()
+
+    @api.model
+    def _cron_rebuild(self):
+        """Rebuild the whole snapshot so aging buckets follow the calendar"""
+        customer_ids = self.env['res.partner'].sudo().search([('customer_rank', '>', 0)]).ids
+        self.flush_model()
+        self.env.cr.execute(
+            "DELETE FROM mobile_receivable_aging WHERE partner_id NOT IN %s",
+            [tuple(customer_ids) or (0,)],
+        )
+        self._refresh_partners(customer_ids)
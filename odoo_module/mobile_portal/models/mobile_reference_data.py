@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+
+from odoo import models, api, tools
+from odoo.tools import SQL
+
+# Near-static lists served to the mobile app: model, domain, fields and order
+REFERENCE_DATA = {
+    'leave_types': ('hr.leave.type', [('active', '=', True)], ['name', 'request_unit', 'requires_allocation'], None),
+    'document_types': ('hr.document.type', [], ['name', 'description'], None),
+    'project_stages': ('project.task.type', [], ['name', 'sequence', 'fold'], 'sequence'),
+}
+
+
+class MobileReferenceData(models.AbstractModel):
+    _name = 'mobile.reference.data'
+    _description = 'Mobile Reference Data Cache'
+
+    @api.model
+    def _get_reference_data(self, key, project_id=None):
+        """Return (records, version) of a reference list as visible to the current user
+
+        The result is kept in the registry cache per user, keyed on the
+        generation of the underlying table, so that changes to the list are
+        picked up without clearing the cache of the whole registry.
+        """
+        records, version = self._read_reference_data(key, project_id, self._get_generation(key, project_id))
+        return [dict(record) for record in records], version
+
+    @api.model
+    def _get_generation(self, key, project_id=None):
+        """Return a value that changes whenever the content of a reference list may change
+
+        That is whenever a record of the list's model is created, written or
+        deleted, and for a list filtered on a project, whenever the stages
+        of the project change, which can be edited from the project side
+        without touching the stages themselves.
+        """
+        Model = self.env[REFERENCE_DATA[key][0]]
+        self.env.cr.execute(SQL("SELECT count(*), max(write_date) FROM %s", SQL.identifier(Model._table)))
+        count, last_write = self.env.cr.fetchone()
+        generation = (count, last_write and last_write.isoformat())
+        if project_id:
+            field = Model._fields['project_ids']
+            self.env.cr.execute(SQL(
+                "SELECT array_agg(%s ORDER BY %s) FROM %s WHERE %s = %s",
+                SQL.identifier(field.column1), SQL.identifier(field.column1),
+                SQL.identifier(field.relation), SQL.identifier(field.column2), project_id,
+            ))
+            generation += (tuple(self.env.cr.fetchone()[0] or ()),)
+        return generation
+
+    @api.model
+    @tools.ormcache('key', 'project_id', 'generation', 'self.env.uid', 'tuple(self.env.companies.ids)', 'self.env.lang')
+    def _read_reference_data(self, key, project_id, generation):
+        model_name, domain, field_names, order = REFERENCE_DATA[key]
+        if project_id:
+            domain = domain + [('project_ids', 'in', [project_id])]
+        records = self.env[model_name].search_read(domain, field_names, order=order)
+        return records, self._get_version(records)
+
+    @api.model
+    def _get_version(self, data):
+        """Return a short hash identifying the content of data"""
+        payload = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()[:16]
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools.sql import create_index
+
+TOMBSTONE_RETENTION_DAYS = 90
+
+# Indexes backing the write_date cursors of /mobile/api/sync
+SYNC_INDEXES = {
+    'hr_leave': ['employee_id', 'write_date', 'id'],
+    'hr_payslip': ['employee_id', 'write_date', 'id'],
+    'hr_remote_attendance': ['employee_id', 'write_date', 'id'],
+    'hr_employee_document_request': ['employee_id', 'write_date', 'id'],
+    'project_task': ['write_date', 'id'],
+}
+
+
+class MobileSyncTombstone(models.Model):
+    _name = 'mobile.sync.tombstone'
+    _description = 'Mobile Sync Deletion Log'
+    _order = 'create_date, id'
+
+    res_model = fields.Char(
+        string='Model',
+        required=True,
+    )
+    res_id = fields.Integer(
+        string='Record ID',
+        required=True,
+    )
+    user_id = fields.Many2one(
+        'res.users',
+        string='User',
+        required=True,
+        ondelete='cascade',
+    )
+
+    def init(self):
+        create_index(
+            self._cr, 'mobile_sync_tombstone_model_user_date_idx', self._table,
+            ['res_model', 'user_id', 'create_date'],
+        )
+        for table, columns in SYNC_INDEXES.items():
+            create_index(self._cr, f'{table}_mobile_sync_idx', table, columns)
+
+    @api.model
+    def _log(self, user_ids_by_record):
+        """Record that the given records are gone for the given users
+
+        ``user_ids_by_record`` maps records (of any model) to the ids of the
+        mobile users who may hold a copy of them.
+        """
+        vals_list = [
+            {'res_model': record._name, 'res_id': record.id, 'user_id': user_id}
+            for record, user_ids in user_ids_by_record.items()
+            for user_id in user_ids
+        ]
+        if vals_list:
+            self.sudo().create(vals_list)
+
+    @api.model
+    def _get_deleted_ids(self, res_model, since, until):
+        """Return the ids of the records of res_model gone for the current user in the (since, until] window"""
+        tombstones = self.sudo().search_read([
+            ('res_model', '=', res_model),
+            ('user_id', '=', self.env.uid),
+            ('create_date', '>', since),
+            ('create_date', '<=', until),
+        ], ['res_id'])
+        return sorted({tombstone['res_id'] for tombstone in tombstones})
+
+    @api.model
+    def _get_retention_start(self):
+        """Cursors older than this date can no longer be served incrementally"""
+        return fields.Datetime.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+
+    @api.autovacuum
+    def _gc_tombstones(self):
+        self.sudo().search([('create_date', '<', self._get_retention_start())]).unlink()
+
+
+class MobileSyncMixin(models.AbstractModel):
+    _name = 'mobile.sync.mixin'
+    _description = 'Mobile Sync Deletion Tracking'
+
+    def _get_mobile_sync_user_ids(self):
+        """Return the ids of the mobile users who may hold a copy of this record"""
+        self.ensure_one()
+        return self.employee_id.user_id.ids
+
+    def _log_mobile_sync_tombstones(self):
+        self.env['mobile.sync.tombstone']._log({
+            record: record._get_mobile_sync_user_ids() for record in self
+        })
+
+    def write(self, vals):
+        if 'active' in vals and not vals['active']:
+            self.filtered('active')._log_mobile_sync_tombstones()
+        return super().write(vals)
+
+    def unlink(self):
+        self._log_mobile_sync_tombstones()
+        return super().unlink()
+
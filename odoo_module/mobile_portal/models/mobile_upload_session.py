@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import secrets
+import shutil
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+UPLOAD_BLOCK_SIZE = 64 * 1024
+UPLOAD_SESSION_LIFETIME = timedelta(days=2)
+
+
+class MobileUploadSession(models.Model):
+    _name = 'mobile.upload.session'
+    _description = 'Mobile Chunked Upload'
+    _order = 'create_date desc'
+
+    token = fields.Char(
+        string='Token',
+        required=True,
+        index=True,
+        copy=False,
+        default=lambda self: secrets.token_urlsafe(24),
+    )
+    name = fields.Char(
+        string='Filename',
+        required=True,
+    )
+    mimetype = fields.Char(
+        string='Mime Type',
+    )
+    user_id = fields.Many2one(
+        'res.users',
+        string='User',
+        required=True,
+        ondelete='cascade',
+        default=lambda self: self.env.user,
+    )
+    file_size = fields.Integer(
+        string='File Size',
+        required=True,
+    )
+    checksum = fields.Char(
+        string='SHA-256',
+        required=True,
+    )
+    received_size = fields.Integer(
+        string='Received Size',
+        default=0,
+    )
+
+    _sql_constraints = [
+        ('token_uniq', 'unique(token)', 'Upload tokens must be unique.'),
+    ]
+
+    @api.model
+    def _get_session(self, token):
+        """Return the upload session of the current user with the given token"""
+        return self.sudo().search([('token', '=', token), ('user_id', '=', self.env.uid)], limit=1)
+
+    def _get_part_path(self):
+        self.ensure_one()
+        directory = os.path.join(self.env['ir.attachment']._filestore(), 'mobile_uploads')
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f'{self.token}.part')
+
+    def _append_chunk(self, offset, stream, length):
+        """Write length bytes read from stream at offset in the partial file
+
+        Chunks are appended in order; a chunk resent after a disconnect
+        overwrites whatever was written from its offset onwards.
+        """
+        self.ensure_one()
+        self.env.cr.execute("SELECT id FROM mobile_upload_session WHERE id = %s FOR UPDATE", [self.id])
+        self.invalidate_recordset(['received_size'])
+        if offset < 0 or offset > self.received_size:
+            raise UserError(f'Unexpected offset {offset}, resume from {self.received_size}')
+        if offset + length > self.file_size:
+            raise UserError('Chunk exceeds the announced file size')
+
+        path = self._get_part_path()
+        written = 0
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+            part.seek(offset)
+            while written < length:
+                block = stream.read(min(UPLOAD_BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                part.write(block)
+                written += len(block)
+            part.truncate()
+        self.received_size = offset + written
+
+    def _prepare_attachment_values(self):
+        """Check the completed upload and return the values of its attachment
+
+        The partial file is hashed block by block and, with a file-based
+        attachment storage, linked into the filestore as the attachment's
+        file, so that the document is never held in memory or rewritten.
+        """
+        self.ensure_one()
+        if self.received_size != self.file_size:
+            raise UserError(f'Upload of {self.name} is incomplete')
+
+        path = self._get_part_path()
+        sha256, sha1 = hashlib.sha256(), hashlib.sha1()
+        with open(path, 'rb') as part:
+            for block in iter(lambda: part.read(UPLOAD_BLOCK_SIZE), b''):
+                sha256.update(block)
+                sha1.update(block)
+        if sha256.hexdigest() != self.checksum.lower():
+            raise UserError(f'Checksum mismatch for {self.name}')
+
+        values = {'name': self.name}
+        if self.mimetype:
+            values['mimetype'] = self.mimetype
+
+        Attachment = self.env['ir.attachment']
+        if Attachment._storage() == 'db':
+            with open(path, 'rb') as part:
+                values['raw'] = part.read()
+            return values
+
+        checksum = sha1.hexdigest()
+        store_fname = f'{checksum[:3]}/{checksum}'
+        full_path = Attachment._full_path(store_fname)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # The part file stays in place until the transaction commits, in
+            # case the submission is rolled back and retried
+            try:
+                os.link(path, full_path)
+            except OSError:
+                shutil.copyfile(path, full_path)
+            # Collected with the other orphans if the attachment is rolled back
+            Attachment._mark_for_gc(store_fname)
+        values.update(store_fname=store_fname, checksum=checksum, file_size=self.file_size)
+        return values
+
+    def _close(self):
+        """Delete the sessions, and their partial files once the transaction is committed"""
+        paths = [session._get_part_path() for session in self]
+
+        @self.env.cr.postcommit.add
+        def remove_part_files():
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+        self.sudo().unlink()
+
+    @api.autovacuum
+    def _gc_upload_sessions(self):
+        self.sudo().search([('create_date', '<', fields.Datetime.now() - UPLOAD_SESSION_LIFETIME)])._close()
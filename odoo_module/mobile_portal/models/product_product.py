@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+from odoo import models, fields, api
+from odoo.osv import expression
+from odoo.tools import SQL, escape_psql
+from odoo.tools.sql import create_index
+
+# Search terms shaped like an internal reference or a barcode: a single word
+# containing at least one digit
+CODE_SEARCH_RE = re.compile(r'^(?=.*\d)[\w\-./]+$')
+
+
+class ProductTemplate(models.Model):
+    _inherit = 'product.template'
+
+    # Lets the ORM answer "name ilike %term%" from a trigram index
+    name = fields.Char(
+        index='trigram',
+    )
+
+
+class ProductProduct(models.Model):
+    _inherit = 'product.product'
+
+    def init(self):
+        create_index(
+            self._cr, 'product_product_default_code_prefix_idx', self._table,
+            ['default_code text_pattern_ops'],
+        )
+        if self.env.registry.has_trigram:
+            create_index(
+                self._cr, 'product_product_default_code_trgm_idx', self._table,
+                ['default_code gin_trgm_ops'], method='gin',
+            )
+
+    @api.model
+    def _search_mobile(self, term, domain=None, limit=50, offset=0):
+        """Return (products, has_more, domain) matching term, most relevant first
+
+        Terms that look like a code are first matched on the internal
+        reference prefix and the exact barcode, which are answered by btree
+        indexes; the substring search on name and internal reference, backed
+        by trigram indexes, only runs when that finds nothing. Results are
+        ranked exact code, code prefix, name prefix, then name similarity.
+        The returned domain is the one that was matched, for counting.
+        """
+        domain = domain or []
+        term = term.strip()
+        if CODE_SEARCH_RE.match(term):
+            code_domain = expression.AND([domain, [
+                '|', ('default_code', '=like', f'{escape_psql(term)}%'), ('barcode', '=', term),
+            ]])
+            products, has_more = self._search_mobile_ranked(term, code_domain, limit, offset)
+            if products or offset:
+                return products, has_more, code_domain
+
+        text_domain = expression.AND([domain, [
+            '|', ('name', 'ilike', term), ('default_code', 'ilike', term),
+        ]])
+        products, has_more = self._search_mobile_ranked(term, text_domain, limit, offset)
+        return products, has_more, text_domain
+
+    @api.model
+    def _search_mobile_ranked(self, term, domain, limit, offset):
+        query = self._search(domain)
+        # Same join as the one the ORM adds for the inherited fields of the
+        # domain (sale_ok, name), so that it is reused rather than conflicting
+        template_alias = query.make_alias(self._table, 'product_tmpl_id')
+        query.add_join('LEFT JOIN', template_alias, 'product_template', SQL(
+            "%s = %s",
+            SQL.identifier(self._table, 'product_tmpl_id'),
+            SQL.identifier(template_alias, 'id'),
+        ))
+        name = SQL(
+            "COALESCE(%s->>%s, %s->>'en_US')",
+            SQL.identifier(template_alias, 'name'), self.env.lang or 'en_US',
+            SQL.identifier(template_alias, 'name'),
+        )
+        default_code = SQL.identifier(self._table, 'default_code')
+        prefix = f'{escape_psql(term)}%'
+        rank = SQL(
+            """CASE WHEN %(code)s = %(term)s THEN 0
+                    WHEN %(code)s ILIKE %(prefix)s THEN 1
+                    WHEN %(name)s ILIKE %(prefix)s THEN 2
+                    ELSE 3 END""",
+            code=default_code, name=name, term=term, prefix=prefix,
+        )
+        order = [rank]
+        if self.env.registry.has_trigram:
+            order.append(SQL("similarity(%s, %s) DESC", name, term))
+        order.extend([name, SQL.identifier(self._table, 'id')])
+        query.order = SQL(", ").join(order)
+        query.limit = limit + 1
+        query.offset = offset
+
+        self.env.cr.execute(query.select(SQL.identifier(self._table, 'id')))
+        ids = [row[0] for row in self.env.cr.fetchall()]
+        return self.browse(ids[:limit]), len(ids) > limit
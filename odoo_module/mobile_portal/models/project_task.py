@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+
+class ProjectTask(models.Model):
+    _name = 'project.task'
+    _inherit = ['project.task', 'mobile.sync.mixin']
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        tasks = super().create(vals_list)
+        self.env['mobile.dashboard.summary']._mark_stale(user_ids=tasks.user_ids.ids)
+        return tasks
+
+    def write(self, vals):
+        if not {'user_ids', 'stage_id', 'active'} & set(vals):
+            return super().write(vals)
+        previous_user_ids = {task: set(task.user_ids.ids) for task in self}
+        res = super().write(vals)
+        if 'user_ids' in vals:
+            self.env['mobile.sync.tombstone']._log({
+                task: user_ids - set(task.user_ids.ids)
+                for task, user_ids in previous_user_ids.items()
+            })
+        self.env['mobile.dashboard.summary']._mark_stale(
+            user_ids=set().union(*previous_user_ids.values()) | set(self.user_ids.ids),
+        )
+        return res
+
+    def unlink(self):
+        self.env['mobile.dashboard.summary']._mark_stale(user_ids=self.user_ids.ids)
+        return super().unlink()
+
+    def _get_mobile_sync_user_ids(self):
+        self.ensure_one()
+        return self.user_ids.ids
@@ -1,6 +1,27 @@
 # -*- coding: utf-8 -*-
 
+import csv
+import io
+from collections import defaultdict
+
 from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.tools.sql import create_index
+from odoo.addons.mobile_portal.tools.profiler import profiled
+
+BULK_IMPORT_MAX_ROWS = 5000
+BULK_IMPORT_FIELDS = ('product_id', 'default_code', 'price', 'date', 'notes', 'supplier_id')
+
+# Fields whose change moves the latest flag, and the price change of following entries
+LATEST_FLAG_FIELDS = {'product_id', 'supplier_id', 'date', 'company_id'}
+PRICE_CHANGE_FIELDS = {'product_id', 'date', 'price'}
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 
 class PurchaseMarketPrice(models.Model):
@@ -70,25 +91,158 @@ class PurchaseMarketPrice(models.Model):
         compute='_compute_price_change',
         store=True,
     )
+    is_latest = fields.Boolean(
+        string='Latest Price',
+        readonly=True,
+        copy=False,
+        help='Most recent entry recorded for this product in its company',
+    )
+
+    def init(self):
+        create_index(
+            self._cr, 'purchase_market_price_product_date_id_idx', self._table,
+            ['product_id', 'date DESC', 'id DESC'],
+        )
+        create_index(
+            self._cr, 'purchase_market_price_latest_company_idx', self._table,
+            ['product_id', 'company_id'], where='is_latest',
+        )
+        self._update_latest_flags()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._update_latest_flags(records.product_id.ids)
+        self._recompute_following_entries(records._get_product_dates())
+        return records
+
+    def write(self, vals):
+        update_latest = bool(LATEST_FLAG_FIELDS & set(vals))
+        recompute_changes = bool(PRICE_CHANGE_FIELDS & set(vals))
+        if not update_latest and not recompute_changes:
+            return super().write(vals)
+        product_dates = self._get_product_dates()
+        res = super().write(vals)
+        product_dates |= self._get_product_dates()
+        if update_latest:
+            self._update_latest_flags(list({product_id for product_id, _date in product_dates}))
+        if recompute_changes:
+            self._recompute_following_entries(product_dates)
+        return res
+
+    def unlink(self):
+        product_dates = self._get_product_dates()
+        res = super().unlink()
+        self._update_latest_flags(list({product_id for product_id, _date in product_dates}))
+        self._recompute_following_entries(product_dates)
+        return res
+
+    @api.model
+    def _update_latest_flags(self, product_ids=None):
+        """Flag the most recent entry of each product and company in a single statement
+
+        When product_ids is None the flags of every product are rebuilt.
+        """
+        if product_ids is not None and not product_ids:
+            return
+        self.flush_model(['product_id', 'company_id', 'date', 'is_latest'])
+        product_filter = 'WHERE product_id IN %(product_ids)s' if product_ids is not None else ''
+        self.env.cr.execute(f"""
+            UPDATE purchase_market_price price
+               SET is_latest = (price.id = latest.id)
+              FROM (
+                    SELECT DISTINCT ON (product_id, company_id) product_id, company_id, id
+                      FROM purchase_market_price
+                      {product_filter}
+                  ORDER BY product_id, company_id, date DESC, id DESC
+                   ) latest
+             WHERE price.product_id = latest.product_id
+               AND price.company_id = latest.company_id
+               AND price.is_latest IS DISTINCT FROM (price.id = latest.id)
+        """, {'product_ids': tuple(product_ids or ())})
+        self.invalidate_model(['is_latest'])
 
     @api.depends('product_id', 'price', 'date')
     def _compute_price_change(self):
+        """Compare each entry with the last entry of the previous date
+
+        The price series of every product involved is loaded once and walked
+        in date order, so a whole recordset is computed in a single query.
+        """
+        series = defaultdict(list)
+        for product_id, record_id, date, price in self._read_price_series():
+            series[product_id].append((date, record_id, price, None))
         for record in self:
-            # Find previous price for the same product
-            previous = self.search([
-                ('product_id', '=', record.product_id.id),
-                ('id', '!=', record.id),
-                ('date', '<', record.date),
-            ], limit=1, order='date desc')
-
-            if previous and previous.price:
-                record.previous_price = previous.price
-                record.price_change = ((record.price - previous.price) / previous.price) * 100
-            else:
-                record.previous_price = 0.0
-                record.price_change = 0.0
+            if record.product_id and record.date:
+                series[record.product_id.id].append(
+                    (record.date, record._origin.id or float('inf'), record.price, record)
+                )
+
+        for entries in series.values():
+            entries.sort(key=lambda entry: entry[:2])
+            current_date = previous_price = current_price = None
+            for date, _record_id, price, record in entries:
+                if date != current_date:
+                    current_date, previous_price = date, current_price
+                current_price = price
+                if record is None:
+                    continue
+                if previous_price:
+                    record.previous_price = previous_price
+                    record.price_change = ((price - previous_price) / previous_price) * 100
+                else:
+                    record.previous_price = 0.0
+                    record.price_change = 0.0
+
+        for record in self.filtered(lambda rec: not rec.product_id or not rec.date):
+            record.previous_price = 0.0
+            record.price_change = 0.0
+
+    def _read_price_series(self):
+        """Return (product_id, id, date, price) of the stored entries sharing
+        a product with these records, excluding the records themselves"""
+        product_ids = tuple(self.product_id.ids)
+        if not product_ids:
+            return []
+        self.flush_model(['product_id', 'date', 'price'])
+        self.env.cr.execute("""
+            SELECT product_id, id, date, price
+              FROM purchase_market_price
+             WHERE product_id IN %s
+               AND id NOT IN %s
+        """, [product_ids, tuple(self._origin.ids) or (0,)])
+        return self.env.cr.fetchall()
+
+    def _get_product_dates(self):
+        return {(record.product_id.id, record.date) for record in self if record.product_id and record.date}
+
+    @api.model
+    def _recompute_following_entries(self, product_dates):
+        """Schedule the recomputation of the entries dated right after each
+        (product_id, date) pair, i.e. those whose previous price may change"""
+        if not product_dates:
+            return
+        product_ids, dates = zip(*product_dates)
+        self.flush_model(['product_id', 'date'])
+        self.env.cr.execute("""
+            SELECT price.id
+              FROM unnest(%s::int[], %s::date[]) AS changed(product_id, date)
+              JOIN purchase_market_price price
+                ON price.product_id = changed.product_id
+               AND price.date = (
+                       SELECT MIN(later.date)
+                         FROM purchase_market_price later
+                        WHERE later.product_id = changed.product_id
+                          AND later.date > changed.date
+                   )
+        """, [list(product_ids), list(dates)])
+        following = self.browse({row[0] for row in self.env.cr.fetchall()})
+        if following:
+            for field_name in ('previous_price', 'price_change'):
+                self.env.add_to_compute(self._fields[field_name], following)
 
     @api.model
+    @profiled
     def create_from_mobile(self, product_id, price, date, notes=None, supplier_id=None):
         """Create market price entry from mobile app"""
         values = {
@@ -104,33 +258,127 @@ class PurchaseMarketPrice(models.Model):
         return self.create(values).id
 
     @api.model
+    def create_bulk_from_mobile(self, rows):
+        """Create market price entries from a list of row dicts
+
+        Rows identify their product by ``product_id`` or ``default_code``. All
+        rows are validated up front, the valid ones are created in a single
+        batch without chatter tracking, and one result is returned per row:
+        ``{'row': index, 'price_id': id}`` or ``{'row': index, 'error': message}``.
+        """
+        if len(rows) > BULK_IMPORT_MAX_ROWS:
+            raise UserError(f'At most {BULK_IMPORT_MAX_ROWS} rows can be imported at once')
+
+        product_codes = {row.get('default_code') for row in rows if not row.get('product_id')} - {None, ''}
+        product_ids_by_code = {}
+        if product_codes:
+            for product in self.env['product.product'].search_read(
+                [('default_code', 'in', list(product_codes))], ['default_code'],
+            ):
+                product_ids_by_code.setdefault(product['default_code'], product['id'])
+        product_ids = {
+            _to_int(row['product_id']) for row in rows if row.get('product_id')
+        } - {None}
+        existing_product_ids = set(self.env['product.product'].browse(product_ids).exists().ids)
+        supplier_ids = {
+            _to_int(row['supplier_id']) for row in rows if row.get('supplier_id')
+        } - {None}
+        existing_supplier_ids = set(self.env['res.partner'].browse(supplier_ids).exists().ids)
+
+        results = []
+        vals_list = []
+        for index, row in enumerate(rows):
+            try:
+                if row.get('product_id'):
+                    product_id = _to_int(row['product_id'])
+                    if product_id not in existing_product_ids:
+                        raise ValueError(f"Unknown product {row['product_id']}")
+                elif row.get('default_code'):
+                    product_id = product_ids_by_code.get(row['default_code'])
+                    if not product_id:
+                        raise ValueError(f"Unknown product code {row['default_code']}")
+                else:
+                    raise ValueError('Missing product')
+
+                if row.get('price') in (None, ''):
+                    raise ValueError('Missing price')
+                try:
+                    price = float(row['price'])
+                except (TypeError, ValueError):
+                    raise ValueError(f"Invalid price {row['price']}")
+                if price < 0:
+                    raise ValueError('Price cannot be negative')
+
+                if not row.get('date'):
+                    raise ValueError('Missing date')
+                try:
+                    date = fields.Date.to_date(row['date'])
+                except (TypeError, ValueError):
+                    raise ValueError(f"Invalid date {row['date']}")
+
+                values = {
+                    'product_id': product_id,
+                    'price': price,
+                    'date': date,
+                    'notes': row.get('notes') or False,
+                    'user_id': self.env.user.id,
+                }
+                if row.get('supplier_id'):
+                    supplier_id = _to_int(row['supplier_id'])
+                    if supplier_id not in existing_supplier_ids:
+                        raise ValueError(f"Unknown supplier {row['supplier_id']}")
+                    values['supplier_id'] = supplier_id
+            except ValueError as e:
+                results.append({'row': index, 'error': str(e)})
+                continue
+            results.append({'row': index})
+            vals_list.append(values)
+
+        records = self.with_context(tracking_disable=True).create(vals_list)
+        created = iter(records.ids)
+        for result in results:
+            if 'error' not in result:
+                result['price_id'] = next(created)
+        return results
+
+    @api.model
+    def parse_bulk_csv(self, data):
+        """Parse CSV text with a header line into row dicts for create_bulk_from_mobile"""
+        reader = csv.DictReader(io.StringIO(data))
+        if not reader.fieldnames or not {'price', 'date'} <= set(reader.fieldnames):
+            raise UserError('The CSV header must contain price, date and product_id or default_code')
+        return [
+            {key: (value or '').strip() for key, value in row.items() if key in BULK_IMPORT_FIELDS}
+            for row in reader
+        ]
+
+    @api.model
+    @profiled
     def get_latest_prices(self, product_ids=None, limit=100):
-        """Get latest market prices for products"""
-        domain = []
+        """Get latest market prices for products
+
+        The latest entry is kept per company; with several allowed companies,
+        the most recent of their latest entries is returned for each product.
+        """
+        domain = [('is_latest', '=', True), ('company_id', 'in', self.env.companies.ids)]
         if product_ids:
             domain.append(('product_id', 'in', product_ids))
 
-        # Group by product and get latest
-        prices = self.read_group(
+        # At most one latest entry per product and company
+        prices = self.search_read(
             domain,
-            ['product_id', 'price:max', 'date:max'],
-            ['product_id'],
-            limit=limit,
+            ['product_id', 'price', 'date', 'price_change'],
+            limit=limit * len(self.env.companies),
+            order='product_id, date desc, id desc',
         )
 
-        result = []
-        for price_group in prices:
-            latest = self.search([
-                ('product_id', '=', price_group['product_id'][0]),
-            ], limit=1, order='date desc')
-
-            if latest:
-                result.append({
-                    'product_id': latest.product_id.id,
-                    'product_name': latest.product_id.display_name,
-                    'price': latest.price,
-                    'date': latest.date,
-                    'price_change': latest.price_change,
-                })
-
-        return result
+        latest_by_product = {}
+        for price in prices:
+            latest_by_product.setdefault(price['product_id'][0], price)
+        return [{
+            'product_id': price['product_id'][0],
+            'product_name': price['product_id'][1],
+            'price': price['price'],
+            'date': price['date'],
+            'price_change': price['price_change'],
+        } for price in list(latest_by_product.values())[:limit]]
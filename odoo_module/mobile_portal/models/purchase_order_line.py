@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+
+PRICE_HISTORY_STATES = ('purchase', 'done')
+
+
+class PurchaseOrderLine(models.Model):
+    _inherit = 'purchase.order.line'
+
+    def init(self):
+        # date_order is a non-stored related field on the lines: the order
+        # date is read from, and indexed on, purchase_order
+        create_index(
+            self._cr, 'purchase_order_line_partner_product_order_idx', self._table,
+            ['partner_id', 'product_id', 'order_id'],
+        )
+        create_index(
+            self._cr, 'purchase_order_partner_date_idx', 'purchase_order',
+            ['partner_id', 'date_order DESC'],
+        )
+
+    @api.model
+    def _get_supplier_price_history(self, supplier_id, limit=20, window_days=90):
+        """Return the last purchase price of the products most recently bought from a supplier
+
+        Exactly ``limit`` distinct products are returned (fewer only if the
+        supplier has fewer), each with its latest line and the min/avg/max
+        unit price of its lines over the last ``window_days`` days, all
+        computed in one grouped query over the confirmed lines.
+        """
+        query = self._search([
+            ('partner_id', '=', supplier_id),
+            ('state', 'in', PRICE_HISTORY_STATES),
+            ('product_id', '!=', False),
+        ])
+        line = SQL.identifier(self._table)
+        query.add_join('JOIN', 'mobile_order', 'purchase_order', SQL(
+            "%s = %s", SQL.identifier('mobile_order', 'id'), SQL.identifier(self._table, 'order_id'),
+        ))
+        lines = query.select(
+            SQL("%s.id", line), SQL("%s.product_id", line), SQL("%s.price_unit", line),
+            SQL("%s.product_qty", line), SQL("%s.product_uom", line),
+            SQL("%s AS date_order", SQL.identifier('mobile_order', 'date_order')),
+        )
+        latest = "ORDER BY date_order DESC, id DESC"
+        self.env.cr.execute(SQL(f"""
+            SELECT product_id,
+                   (array_agg(price_unit {latest}))[1],
+                   (array_agg(product_qty {latest}))[1],
+                   (array_agg(product_uom {latest}))[1],
+                   MAX(date_order),
+                   MIN(price_unit) FILTER (WHERE date_order >= %(window_start)s),
+                   AVG(price_unit) FILTER (WHERE date_order >= %(window_start)s),
+                   MAX(price_unit) FILTER (WHERE date_order >= %(window_start)s),
+                   COUNT(*) FILTER (WHERE date_order >= %(window_start)s)
+              FROM (%(lines)s) line
+          GROUP BY product_id
+          ORDER BY MAX(date_order) DESC, product_id
+             LIMIT %(limit)s
+        """, lines=lines, window_start=fields.Datetime.now() - timedelta(days=window_days), limit=limit))
+        rows = self.env.cr.fetchall()
+
+        products = self.env['product.product'].browse([row[0] for row in rows])
+        uoms = self.env['uom.uom'].browse({row[3] for row in rows if row[3]})
+        product_names = dict(zip(products.ids, products.mapped('display_name')))
+        uom_names = dict(zip(uoms.ids, uoms.mapped('name')))
+        return [{
+            'product_id': product_id,
+            'product_name': product_names.get(product_id),
+            'last_price': last_price,
+            'last_qty': last_qty,
+            'uom_id': uom_id,
+            'uom_name': uom_names.get(uom_id),
+            'last_date': str(last_date) if last_date else None,
+            'min_price': min_price,
+            'avg_price': avg_price,
+            'max_price': max_price,
+            'window_count': window_count,
+        } for (product_id, last_price, last_qty, uom_id, last_date,
+               min_price, avg_price, max_price, window_count) in rows]
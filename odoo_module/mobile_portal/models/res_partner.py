@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from odoo import models, api
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    @api.model
+    def _get_receivable_aging(self, partner_ids, today=None, company_ids=None):
+        """Return aging buckets of open customer invoices for many partners
+
+        All buckets are computed in a single grouped query, so the cost does
+        not depend on the number of partners or invoices.
+        """
+        aging = {
+            partner_id: {'0_30': 0.0, '31_60': 0.0, '61_90': 0.0, '90_plus': 0.0}
+            for partner_id in partner_ids
+        }
+        if not partner_ids:
+            return aging
+
+        self.env['account.move'].flush_model([
+            'partner_id', 'move_type', 'state', 'payment_state',
+            'invoice_date_due', 'amount_residual', 'company_id',
+        ])
+        self.env.cr.execute("""
+            SELECT partner_id,
+                   SUM(CASE WHEN %(today)s - invoice_date_due <= 30
+                            THEN amount_residual ELSE 0 END),
+                   SUM(CASE WHEN %(today)s - invoice_date_due BETWEEN 31 AND 60
+                            THEN amount_residual ELSE 0 END),
+                   SUM(CASE WHEN %(today)s - invoice_date_due BETWEEN 61 AND 90
+                            THEN amount_residual ELSE 0 END),
+                   SUM(CASE WHEN %(today)s - invoice_date_due > 90
+                            THEN amount_residual ELSE 0 END)
+              FROM account_move
+             WHERE partner_id IN %(partner_ids)s
+               AND move_type = 'out_invoice'
+               AND state = 'posted'
+               AND payment_state IN ('not_paid', 'partial')
+               AND invoice_date_due IS NOT NULL
+               AND company_id IN %(company_ids)s
+          GROUP BY partner_id
+        """, {
+            'today': today or date.today(),
+            'partner_ids': tuple(partner_ids),
+            'company_ids': tuple(company_ids or self.env.companies.ids),
+        })
+        for partner_id, bucket_0_30, bucket_31_60, bucket_61_90, bucket_90_plus in self.env.cr.fetchall():
+            aging[partner_id] = {
+                '0_30': bucket_0_30,
+                '31_60': bucket_31_60,
+                '61_90': bucket_61_90,
+                '90_plus': bucket_90_plus,
+            }
+        return aging
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'credit_limit' in vals:
+            self.env['mobile.receivable.aging']._schedule_refresh(self.ids)
+        return res
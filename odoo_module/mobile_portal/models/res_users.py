@@ -2,6 +2,13 @@
 
 from odoo import models, fields, api
 
+MOBILE_ACCESS_FIELDS = (
+    'mobile_hr_access',
+    'mobile_sales_access',
+    'mobile_purchase_access',
+    'mobile_project_access',
+)
+
 
 class ResUsers(models.Model):
     _inherit = 'res.users'
@@ -27,13 +34,17 @@ class ResUsers(models.Model):
         help='Allow access to Project module in mobile app',
     )
 
+    def write(self, vals):
+        res = super().write(vals)
+        if any(field in vals for field in MOBILE_ACCESS_FIELDS):
+            self.env['mobile.dashboard.summary']._mark_stale(user_ids=self.ids)
+        return res
+
     @api.model
     def get_mobile_permissions(self):
         """Return current user's mobile module permissions"""
         user = self.env.user
-        employee = self.env['hr.employee'].search([
-            ('user_id', '=', user.id)
-        ], limit=1)
+        employee = self.env['hr.employee']._get_current_employee()
 
         return {
             'user_id': user.id,
@@ -52,9 +63,7 @@ class ResUsers(models.Model):
     def get_mobile_dashboard_data(self):
         """Return dashboard summary data for mobile app"""
         user = self.env.user
-        employee = self.env['hr.employee'].search([
-            ('user_id', '=', user.id)
-        ], limit=1)
+        employee = self.env['hr.employee']._get_current_employee()
 
         data = {
             'user': {
@@ -74,29 +83,9 @@ class ResUsers(models.Model):
                 'department': employee.department_id.name if employee.department_id else None,
             }
 
-            # HR Summary
-            if user.mobile_hr_access:
-                pending_leaves = self.env['hr.leave'].search_count([
-                    ('employee_id', '=', employee.id),
-                    ('state', '=', 'confirm'),
-                ])
-                data['summary']['pending_leaves'] = pending_leaves
-
-            # Sales Summary
-            if user.mobile_sales_access:
-                open_invoices = self.env['account.move'].search_count([
-                    ('move_type', '=', 'out_invoice'),
-                    ('state', '=', 'posted'),
-                    ('payment_state', 'in', ['not_paid', 'partial']),
-                ])
-                data['summary']['open_invoices'] = open_invoices
-
-            # Project Summary
-            if user.mobile_project_access:
-                my_tasks = self.env['project.task'].search_count([
-                    ('user_ids', 'in', [user.id]),
-                    ('stage_id.fold', '=', False),
-                ])
-                data['summary']['active_tasks'] = my_tasks
+            counters = self.env['mobile.dashboard.summary']._get_counters(employee)
+            data['summary'] = {
+                key: value for key, value in counters.items() if value is not None
+            }
 
         return data
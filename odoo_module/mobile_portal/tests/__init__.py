@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+
+from . import test_mobile_benchmark
+from . import test_mobile_product_search
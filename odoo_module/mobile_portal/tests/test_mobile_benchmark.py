@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+"""Query-count and latency benchmark of the mobile API
+
+The suite is excluded from the standard test run; run it on a local
+database with::
+
+    odoo-bin -d bench -i mobile_portal --test-tags mobile_benchmark --stop-after-init
+
+Environment variables:
+
+``MOBILE_BENCHMARK_SCALE``
+    Fraction of the production volumes to seed (default 0.01). 1.0 seeds
+    5k employees, 1M invoices, 200k products, 500k market prices and 2M
+    attendances.
+``MOBILE_BENCHMARK_ROUNDS``
+    Timed calls per route or method (default 10).
+``MOBILE_BENCHMARK_OUTPUT``
+    Path of the JSON baseline written at the end (default
+    ``mobile_portal_benchmark.json`` in the temporary directory).
+
+Query ceilings include the request and session handling of each call. List
+routes must also run the same number of queries for a small and a large
+page, which is what catches N+1 regressions whatever the volume.
+"""
+
+import json
+import math
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from odoo import fields, release
+from odoo.addons.account.tests.common import AccountTestInvoicingHttpCommon
+from odoo.tests import tagged
+
+FULL_VOLUMES = {
+    'employees': 5000,
+    'invoices': 1000000,
+    'products': 200000,
+    'market_prices': 500000,
+    'attendances': 2000000,
+}
+CUSTOMERS = 200
+SUPPLIERS = 30
+SUPPLIER_ORDERS = 50
+LARGE_INVOICE_LINES = 60
+TASKS = 50
+
+# Page sizes compared by the N+1 check; every list seeds more records than the largest
+PAGE_SIZES = (5, 15)
+
+DEFAULT_QUERY_CEILING = 30
+
+# (name, path, params, query ceiling, page parameter to vary or None)
+ROUTES = [
+    ('permissions', '/mobile/api/user/permissions', {}, 20, None),
+    ('dashboard', '/mobile/api/user/dashboard', {}, 20, None),
+    ('sync', '/mobile/api/sync', {'limit': 100}, 60, 'limit'),
+    ('payslips', '/mobile/api/hr/payslips', {}, 25, None),
+    ('leave_types', '/mobile/api/hr/leave/types', {}, 15, None),
+    ('leaves', '/mobile/api/hr/leaves', {}, 25, 'limit'),
+    ('attendance_status', '/mobile/api/hr/attendance/status', {}, 15, None),
+    ('attendance_history', '/mobile/api/hr/attendance/history', {}, 25, 'limit'),
+    ('documents', '/mobile/api/hr/documents', {}, 25, 'limit'),
+    ('document_types', '/mobile/api/hr/document/types', {}, 15, None),
+    ('invoices', '/mobile/api/sales/invoices', {'count': 'estimate'}, 30, 'limit'),
+    ('invoice_detail', '/mobile/api/sales/invoice/{large_invoice_id}', {}, 30, 'lines_limit'),
+    ('customer_credit', '/mobile/api/sales/customer/credit', {'count': 'estimate'}, 30, 'limit'),
+    ('products', '/mobile/api/sales/products', {'count': 'none'}, 25, 'limit'),
+    ('product_search', '/mobile/api/sales/products', {'search': 'Benchmark Product 12', 'count': 'none'}, 25, 'limit'),
+    ('product_code_search', '/mobile/api/sales/products', {'search': 'BM00012', 'count': 'none'}, 25, 'limit'),
+    ('suppliers', '/mobile/api/purchase/suppliers', {}, 25, 'limit'),
+    ('supplier_prices', '/mobile/api/purchase/supplier/{supplier_id}/prices', {}, 25, 'limit'),
+    ('market_prices', '/mobile/api/purchase/market_prices', {}, 20, 'limit'),
+    ('tasks', '/mobile/api/project/tasks', {}, 30, 'limit'),
+    ('task_detail', '/mobile/api/project/task/{task_id}', {}, 25, None),
+    ('project_stages', '/mobile/api/project/stages', {}, 15, None),
+    ('batch', '/mobile/api/batch', {'calls': [
+        {'path': '/mobile/api/user/permissions'},
+        {'path': '/mobile/api/user/dashboard'},
+        {'path': '/mobile/api/hr/attendance/status'},
+    ]}, 35, None),
+]
+
+# (name, model, method, args, query ceiling)
+MODEL_METHODS = [
+    ('res.users.get_mobile_permissions', 'res.users', 'get_mobile_permissions', [], 5),
+    ('res.users.get_mobile_dashboard_data', 'res.users', 'get_mobile_dashboard_data', [], 8),
+    ('purchase.market.price.get_latest_prices', 'purchase.market.price', 'get_latest_prices', [None, 100], 5),
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+@tagged('post_install', '-at_install', '-standard', 'mobile_benchmark')
+class TestMobileBenchmark(AccountTestInvoicingHttpCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.scale = float(os.environ.get('MOBILE_BENCHMARK_SCALE', '0.01'))
+        cls.rounds = int(os.environ.get('MOBILE_BENCHMARK_ROUNDS', '10'))
+        cls.volumes = {key: max(1, int(count * cls.scale)) for key, count in FULL_VOLUMES.items()}
+        cls.baseline = {
+            'odoo_version': release.version,
+            'scale': cls.scale,
+            'rounds': cls.rounds,
+            'volumes': cls.volumes,
+            'routes': {},
+            'methods': {},
+        }
+
+        company = cls.company_data['company']
+        cls.bench_user = cls.env['res.users'].create({
+            'name': 'Mobile Benchmark',
+            'login': 'mobile_benchmark',
+            'password': 'mobile_benchmark',
+            'company_id': company.id,
+            'company_ids': [(6, 0, company.ids)],
+            'groups_id': [(6, 0, [
+                cls.env.ref('base.group_user').id,
+                cls.env.ref('account.group_account_invoice').id,
+                cls.env.ref('purchase.group_purchase_user').id,
+                cls.env.ref('project.group_project_user').id,
+                cls.env.ref('mobile_portal.group_mobile_hr').id,
+                cls.env.ref('mobile_portal.group_mobile_sales').id,
+                cls.env.ref('mobile_portal.group_mobile_purchase').id,
+                cls.env.ref('mobile_portal.group_mobile_project').id,
+            ])],
+            'mobile_hr_access': True,
+            'mobile_sales_access': True,
+            'mobile_purchase_access': True,
+            'mobile_project_access': True,
+        })
+        cls.employee = cls.env['hr.employee'].create({
+            'name': 'Mobile Benchmark',
+            'user_id': cls.bench_user.id,
+            'company_id': company.id,
+        })
+
+        cls._seed_employees()
+        cls._seed_products()
+        cls._seed_market_prices()
+        cls._seed_attendances()
+        cls._seed_invoices()
+        cls._seed_purchases()
+        cls._seed_hr_requests()
+        cls._seed_tasks()
+        cls.env.flush_all()
+        cls.env.cr.execute('ANALYZE')
+
+    @classmethod
+    def tearDownClass(cls):
+        path = os.environ.get('MOBILE_BENCHMARK_OUTPUT') or os.path.join(
+            tempfile.gettempdir(), 'mobile_portal_benchmark.json',
+        )
+        with open(path, 'w') as baseline:
+            json.dump(cls.baseline, baseline, indent=2, sort_keys=True)
+        super().tearDownClass()
+
+    # ==================== Seeding ====================
+
+    @classmethod
+    def _clone(cls, table, template_id, count, overrides, params=None):
+        """Insert count copies of a row in one statement and return their ids
+
+        ``overrides`` maps columns to SQL expressions of ``n``, the 1-based
+        number of the copy; the other columns are copied from the template.
+        """
+        cls.env.flush_all()
+        cr = cls.env.cr
+        cr.execute("""
+            SELECT column_name
+              FROM information_schema.columns
+             WHERE table_schema = current_schema()
+               AND table_name = %s
+               AND column_name != 'id'
+          ORDER BY ordinal_position
+        """, [table])
+        columns = [column for column, in cr.fetchall()]
+        values = [overrides.get(column, f'src."{column}"') for column in columns]
+        cr.execute(f"""
+            INSERT INTO "{table}" ({', '.join(f'"{column}"' for column in columns)})
+            SELECT {', '.join(values)}
+              FROM "{table}" src, generate_series(1, %(count)s) n
+             WHERE src.id = %(template_id)s
+          ORDER BY n
+         RETURNING id
+        """, dict(params or {}, count=count, template_id=template_id))
+        ids = sorted(row[0] for row in cr.fetchall())
+        cls.env.invalidate_all()
+        return ids
+
+    @classmethod
+    def _seed_employees(cls):
+        template = cls.env['hr.employee'].create({
+            'name': 'Benchmark Employee',
+            'company_id': cls.company_data['company'].id,
+        })
+        cls.employee_ids = [template.id] + cls._clone('hr_employee', template.id, cls.volumes['employees'] - 1, {
+            'name': "'Benchmark Employee ' || n",
+            'user_id': 'NULL',
+            'barcode': 'NULL',
+            'pin': 'NULL',
+            'open_remote_attendance_id': 'NULL',
+        })
+
+    @classmethod
+    def _seed_products(cls):
+        template = cls.env['product.product'].create({
+            'name': 'Benchmark Product 0',
+            'default_code': 'BM0000000',
+            'list_price': 10.0,
+            'sale_ok': True,
+            'purchase_ok': True,
+        })
+        count = cls.volumes['products'] - 1
+        template_ids = cls._clone('product_template', template.product_tmpl_id.id, count, {
+            'name': "jsonb_build_object('en_US', 'Benchmark Product ' || n)",
+            'list_price': 'round((1 + random() * 500)::numeric, 2)',
+        })
+        cls.product_ids = [template.id] + cls._clone('product_product', template.id, count, {
+            'product_tmpl_id': '(%(template_ids)s::int[])[n]',
+            'default_code': "'BM' || lpad(n::text, 7, '0')",
+            'barcode': 'NULL',
+        }, {'template_ids': template_ids})
+
+    @classmethod
+    def _seed_market_prices(cls):
+        template = cls.env['purchase.market.price'].create({
+            'product_id': cls.product_ids[0],
+            'price': 10.0,
+            'date': fields.Date.today() - timedelta(days=730),
+        })
+        cls._clone('purchase_market_price', template.id, cls.volumes['market_prices'] - 1, {
+            'product_id': '(%(product_ids)s::int[])[1 + n %% %(product_count)s]',
+            'product_tmpl_id': 'NULL',
+            'date': 'current_date - (n %% 730)',
+            'price': 'round((1 + random() * 500)::numeric, 2)',
+            'is_latest': 'FALSE',
+        }, {'product_ids': cls.product_ids, 'product_count': len(cls.product_ids)})
+        cls.env.cr.execute("""
+            UPDATE purchase_market_price price
+               SET product_tmpl_id = product.product_tmpl_id
+              FROM product_product product
+             WHERE product.id = price.product_id
+               AND price.product_tmpl_id IS NULL
+        """)
+        cls.env['purchase.market.price']._update_latest_flags()
+
+    @classmethod
+    def _seed_attendances(cls):
+        now = fields.Datetime.now()
+        template = cls.env['hr.remote.attendance'].create({
+            'employee_id': cls.employee.id,
+            'check_in': now - timedelta(days=1, hours=9),
+            'check_out': now - timedelta(days=1),
+            'latitude': 24.7136,
+            'longitude': 46.6753,
+            'gps_accuracy': 10.0,
+        })
+        employee_ids = [cls.employee.id] + cls.employee_ids
+        cls._clone('hr_remote_attendance', template.id, cls.volumes['attendances'] - 1, {
+            'employee_id': '(%(employee_ids)s::int[])[1 + n %% %(employee_count)s]',
+            'check_in': "src.check_in - (n / %(employee_count)s) * interval '1 day'",
+            'check_out': "src.check_out - (n / %(employee_count)s) * interval '1 day'",
+            'check_in_key': 'NULL',
+            'check_out_key': 'NULL',
+        }, {'employee_ids': employee_ids, 'employee_count': len(employee_ids)})
+
+    @classmethod
+    def _seed_invoices(cls):
+        customers = cls.env['res.partner'].create([
+            {'name': f'Benchmark Customer {index}', 'customer_rank': 1, 'credit_limit': 5000.0}
+            for index in range(CUSTOMERS)
+        ])
+        cls.customer_ids = customers.ids
+        template = cls.init_invoice(
+            'out_invoice', partner=customers[0], amounts=[100.0, 250.0], post=True,
+        )
+        count = cls.volumes['invoices'] - 1
+        params = {'partner_ids': cls.customer_ids, 'partner_count': len(cls.customer_ids)}
+        partner = '(%(partner_ids)s::int[])[1 + n %% %(partner_count)s]'
+        invoice_date = 'current_date - (n %% 365)'
+        move_ids = cls._clone('account_move', template.id, count, {
+            'name': "'BENCH/' || lpad(n::text, 7, '0')",
+            'partner_id': partner,
+            'commercial_partner_id': partner,
+            'invoice_date': invoice_date,
+            'date': invoice_date,
+            'invoice_date_due': f'{invoice_date} + 30',
+        }, params)
+        for line in template.line_ids:
+            cls._clone('account_move_line', line.id, count, {
+                'move_id': '(%(move_ids)s::int[])[n]',
+                'move_name': "'BENCH/' || lpad(n::text, 7, '0')",
+                'partner_id': partner,
+                'date': invoice_date,
+                'date_maturity': f'{invoice_date} + 30' if line.date_maturity else 'NULL',
+            }, dict(params, move_ids=move_ids))
+        cls.large_invoice = cls.init_invoice(
+            'out_invoice', partner=customers[1], amounts=[10.0 + index for index in range(LARGE_INVOICE_LINES)],
+            post=True,
+        )
+        cls.env['mobile.receivable.aging']._cron_rebuild()
+
+    @classmethod
+    def _seed_purchases(cls):
+        suppliers = cls.env['res.partner'].create([
+            {'name': f'Benchmark Supplier {index}', 'supplier_rank': 1} for index in range(SUPPLIERS)
+        ])
+        cls.supplier = suppliers[0]
+        orders = cls.env['purchase.order'].create([{
+            'partner_id': cls.supplier.id,
+            'order_line': [(0, 0, {
+                'product_id': cls.product_ids[(index * 7 + line) % len(cls.product_ids)],
+                'product_qty': 1 + line,
+                'price_unit': 10.0 + index + line,
+            }) for line in range(5)],
+        } for index in range(SUPPLIER_ORDERS)])
+        orders.button_confirm()
+
+    @classmethod
+    def _seed_hr_requests(cls):
+        cls.leave_type = cls.env['hr.leave.type'].create({
+            'name': 'Benchmark Leave',
+            'requires_allocation': 'no',
+            'request_unit': 'day',
+        })
+        start = fields.Date.today() + timedelta(days=30)
+        cls.env['hr.leave'].create([{
+            'employee_id': cls.employee.id,
+            'holiday_status_id': cls.leave_type.id,
+            'request_date_from': start + timedelta(days=index * 7),
+            'request_date_to': start + timedelta(days=index * 7),
+        } for index in range(20)])
+
+        document_type = cls.env['hr.document.type'].create({'name': 'Benchmark Document'})
+        cls.env['hr.employee.document.request'].create([{
+            'name': f'Benchmark Document {index}',
+            'employee_id': cls.employee.id,
+            'document_type_id': document_type.id,
+        } for index in range(20)])
+
+    @classmethod
+    def _seed_tasks(cls):
+        project = cls.env['project.project'].create({'name': 'Benchmark Project'})
+        stages = cls.env['project.task.type'].create([
+            {'name': name, 'sequence': sequence, 'project_ids': [(6, 0, project.ids)]}
+            for sequence, name in enumerate(['To Do', 'In Progress', 'Done'])
+        ])
+        tasks = cls.env['project.task'].create([{
+            'name': f'Benchmark Task {index}',
+            'project_id': project.id,
+            'stage_id': stages[index % 2].id,
+            'user_ids': [(6, 0, cls.bench_user.ids)],
+            'date_deadline': fields.Date.today() + timedelta(days=index),
+        } for index in range(TASKS)])
+        cls.task = tasks[0]
+
+    # ==================== Helpers ====================
+
+    def _call(self, path, params):
+        """Call a JSON route and return (result, SQL queries, seconds)"""
+        queries = self.cr.sql_log_count
+        start = time.perf_counter()
+        response = self.url_open(
+            path,
+            data=json.dumps({'jsonrpc': '2.0', 'method': 'call', 'id': 1, 'params': params}),
+            headers={'Content-Type': 'application/json'},
+        )
+        elapsed = time.perf_counter() - start
+        self.assertEqual(response.status_code, 200, path)
+        body = response.json()
+        self.assertNotIn('error', body, f"{path}: {body.get('error')}")
+        return body['result'], self.cr.sql_log_count - queries, elapsed
+
+    def _summarize(self, timings, queries):
+        return {
+            'queries': queries,
+            'p50_ms': round(percentile(timings, 50) * 1000, 2),
+            'p90_ms': round(percentile(timings, 90) * 1000, 2),
+            'p99_ms': round(percentile(timings, 99) * 1000, 2),
+            'max_ms': round(max(timings) * 1000, 2),
+        }
+
+    # ==================== Benchmarks ====================
+
+    def test_routes(self):
+        self.authenticate('mobile_benchmark', 'mobile_benchmark')
+        path_args = {
+            'large_invoice_id': self.large_invoice.id,
+            'supplier_id': self.supplier.id,
+            'task_id': self.task.id,
+        }
+        for name, path, params, ceiling, page_param in ROUTES:
+            with self.subTest(route=name):
+                path = path.format(**path_args)
+                # warm the caches, then keep the query count of the last round
+                self._call(path, params)
+                timings = []
+                for _round in range(self.rounds):
+                    result, queries, elapsed = self._call(path, params)
+                    timings.append(elapsed)
+                self.assertNotIn('error', result or {}, f'{name}: {result}')
+                self.assertLessEqual(queries, ceiling or DEFAULT_QUERY_CEILING, f'{name} ran {queries} queries')
+                if page_param:
+                    small, large = PAGE_SIZES
+                    _result, small_page, _elapsed = self._call(path, dict(params, **{page_param: small}))
+                    _result, large_page, _elapsed = self._call(path, dict(params, **{page_param: large}))
+                    self.assertEqual(
+                        small_page, large_page,
+                        f'{name} runs {small_page} queries for {small} records and {large_page} for {large}',
+                    )
+                self.baseline['routes'][name] = self._summarize(timings, queries)
+
+    def test_write_routes(self):
+        self.authenticate('mobile_benchmark', 'mobile_benchmark')
+        checkin = {'latitude': 24.7136, 'longitude': 46.6753, 'accuracy': 8.0}
+        calls = [
+            ('check_in', '/mobile/api/hr/attendance/check_in', checkin, 40),
+            ('check_out', '/mobile/api/hr/attendance/check_out', checkin, 40),
+            ('market_price_create', '/mobile/api/purchase/market_price/create', {
+                'product_id': self.product_ids[1], 'price': 12.5, 'date_str': str(fields.Date.today()),
+            }, 40),
+            ('market_price_bulk', '/mobile/api/purchase/market_price/bulk', {'rows': [
+                {'product_id': product_id, 'price': 9.5, 'date': str(fields.Date.today())}
+                for product_id in self.product_ids[:100]
+            ]}, 60),
+        ]
+        for name, path, params, ceiling in calls:
+            with self.subTest(route=name):
+                result, queries, elapsed = self._call(path, params)
+                self.assertNotIn('error', result, f'{name}: {result}')
+                self.assertLessEqual(queries, ceiling, f'{name} ran {queries} queries')
+                self.baseline['routes'][name] = self._summarize([elapsed], queries)
+
+    def test_model_methods(self):
+        env = self.env(user=self.bench_user)
+        for name, model, method, args, ceiling in MODEL_METHODS:
+            with self.subTest(method=name):
+                records = env[model]
+                getattr(records, method)(*args)
+                timings = []
+                for _round in range(self.rounds):
+                    env.invalidate_all()
+                    queries = self.cr.sql_log_count
+                    start = time.perf_counter()
+                    getattr(records, method)(*args)
+                    timings.append(time.perf_counter() - start)
+                    queries = self.cr.sql_log_count - queries
+                self.assertLessEqual(queries, ceiling, f'{name} ran {queries} queries')
+                self.baseline['methods'][name] = self._summarize(timings, queries)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestMobileProductSearch(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Product = cls.env['product.product']
+        cls.exact = Product.create({'name': 'Mobile Search Widget', 'default_code': 'MSW100', 'sale_ok': True})
+        cls.prefixed = Product.create({'name': 'Mobile Search Gadget', 'default_code': 'MSW1001', 'sale_ok': True})
+        cls.named = Product.create({'name': 'Cable X200 compatible', 'default_code': 'CBL7', 'sale_ok': True})
+        cls.unsellable = Product.create({'name': 'Mobile Search Widget Spare', 'default_code': 'MSW1002', 'sale_ok': False})
+
+    def test_code_search_ranks_exact_code_first(self):
+        products, has_more, _domain = self.env['product.product']._search_mobile(
+            'MSW100', [('sale_ok', '=', True)], limit=10,
+        )
+        self.assertEqual(products[:2], self.exact + self.prefixed)
+        self.assertNotIn(self.unsellable, products)
+        self.assertFalse(has_more)
+
+    def test_text_search_ranks_and_pages(self):
+        Product = self.env['product.product']
+        products, has_more, domain = Product._search_mobile('mobile search', [('sale_ok', '=', True)], limit=1)
+        self.assertEqual(len(products), 1)
+        self.assertTrue(has_more)
+        next_page, has_more, _domain = Product._search_mobile(
+            'mobile search', [('sale_ok', '=', True)], limit=1, offset=1,
+        )
+        self.assertFalse(has_more)
+        self.assertEqual(products | next_page, self.exact | self.prefixed)
+        self.assertEqual(Product.search_count(domain), 2)
+
+    def test_code_search_falls_back_to_text(self):
+        products, _has_more, _domain = self.env['product.product']._search_mobile(
+            'X200', [('sale_ok', '=', True)], limit=10,
+        )
+        self.assertEqual(products, self.named)
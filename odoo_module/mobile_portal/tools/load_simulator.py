@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Shift-start burst simulator for the mobile API
+
+Replays the traffic of a fleet of mobile clients opening the app at the
+start of a shift against a running Odoo: each virtual user logs in, loads
+its permissions, dashboard and attendance status, uploads a photo and
+checks in, and a share of them submit a leave request. Only the standard
+library is needed; psycopg2 is used when --dsn is given to sample lock
+waits on the database.
+
+Create the load test users once, with an administrator account::
+
+    python3 load_simulator.py setup --url http://localhost:8069 --db bench \\
+        --admin-password admin --users 2000
+
+then replay the burst::
+
+    python3 load_simulator.py run --url http://localhost:8069 --db bench \\
+        --users 2000 --concurrency 200 --ramp-up 60 --think 0.5:3 \\
+        --photo checkin.jpg --dsn "dbname=bench"
+"""
+
+import argparse
+import http.cookiejar
+import json
+import math
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import xmlrpc.client
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+USER_LOGIN = 'mobile_load_{:05d}'
+USER_PASSWORD = 'mobile_load'
+LOCK_SAMPLE_INTERVAL = 0.5
+
+MOBILE_GROUPS = ['base.group_user', 'mobile_portal.group_mobile_hr']
+
+
+class Stats:
+    """Thread-safe latencies and errors per step"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, step, elapsed, error=None):
+        with self.lock:
+            self.latencies[step].append(elapsed)
+            if error:
+                self.errors[step] += 1
+
+
+class LockSampler(threading.Thread):
+    """Sample the backends waiting on a lock, and count deadlocks, during the run"""
+
+    def __init__(self, dsn):
+        super().__init__(daemon=True)
+        import psycopg2
+        self.connection = psycopg2.connect(dsn)
+        self.connection.autocommit = True
+        self.stop_event = threading.Event()
+        self.samples = []
+        self.max_wait = 0.0
+        self.deadlocks_start = self._deadlocks()
+        self.deadlocks = 0
+
+    def _deadlocks(self):
+        with self.connection.cursor() as cr:
+            cr.execute("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+            return cr.fetchone()[0]
+
+    def run(self):
+        while not self.stop_event.wait(LOCK_SAMPLE_INTERVAL):
+            with self.connection.cursor() as cr:
+                cr.execute("""
+                    SELECT count(*), COALESCE(EXTRACT(EPOCH FROM max(now() - query_start)), 0)
+                      FROM pg_stat_activity
+                     WHERE datname = current_database()
+                       AND wait_event_type = 'Lock'
+                """)
+                waiting, longest = cr.fetchone()
+            self.samples.append(waiting)
+            self.max_wait = max(self.max_wait, float(longest))
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        self.deadlocks = self._deadlocks() - self.deadlocks_start
+        self.connection.close()
+
+
+class Client:
+    """One mobile device with its own session cookie"""
+
+    def __init__(self, url, db, stats):
+        self.url = url.rstrip('/')
+        self.db = db
+        self.stats = stats
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+        )
+
+    def _send(self, step, path, data, content_type):
+        request = urllib.request.Request(
+            self.url + path, data=data, method='POST',
+            headers={'Content-Type': content_type, 'Accept-Encoding': 'identity'},
+        )
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=120) as response:
+                body = json.loads(response.read() or b'{}')
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            self.stats.add(step, time.perf_counter() - start, error=str(e))
+            return None
+        result = body.get('result', body)
+        error = body.get('error') or (isinstance(result, dict) and result.get('error'))
+        self.stats.add(step, time.perf_counter() - start, error=error)
+        return None if error else result
+
+    def call(self, step, path, params=None):
+        payload = {'jsonrpc': '2.0', 'method': 'call', 'id': 1, 'params': params or {}}
+        return self._send(step, path, json.dumps(payload).encode(), 'application/json')
+
+    def upload(self, step, path, raw, content_type):
+        return self._send(step, path, raw, content_type)
+
+    def login(self, login, password):
+        return self.call('login', '/web/session/authenticate', {
+            'db': self.db, 'login': login, 'password': password,
+        })
+
+
+def think(think_range):
+    time.sleep(random.uniform(*think_range))
+
+
+def shift_start(index, args, stats, photo):
+    """Scenario of one employee opening the app at the start of a shift"""
+    client = Client(args.url, args.db, stats)
+    if not client.login(USER_LOGIN.format(index), args.password):
+        return
+
+    client.call('permissions', '/mobile/api/user/permissions')
+    client.call('dashboard', '/mobile/api/user/dashboard')
+    status = client.call('attendance_status', '/mobile/api/hr/attendance/status')
+    think(args.think)
+
+    location = {
+        'latitude': 24.7136 + random.uniform(-0.05, 0.05),
+        'longitude': 46.6753 + random.uniform(-0.05, 0.05),
+        'accuracy': random.uniform(5, 30),
+        'device_info': 'load_simulator',
+    }
+    if status and status.get('checked_in'):
+        # left over from a previous run
+        client.call('check_out', '/mobile/api/hr/attendance/check_out', location)
+
+    params = dict(location)
+    if photo:
+        upload = client.upload('attendance_photo', '/mobile/api/hr/attendance/photo', photo, 'image/jpeg')
+        if upload:
+            params['photo_id'] = upload['photo_id']
+    client.call('check_in', '/mobile/api/hr/attendance/check_in', params)
+    client.call('attendance_status', '/mobile/api/hr/attendance/status')
+
+    if random.random() < args.leave_ratio:
+        think(args.think)
+        leave_types = client.call('leave_types', '/mobile/api/hr/leave/types')
+        if leave_types and leave_types.get('records'):
+            day = date.today() + timedelta(days=random.randint(14, 180))
+            client.call('leave_create', '/mobile/api/hr/leave/create', {
+                'holiday_status_id': random.choice(leave_types['records'])['id'],
+                'date_from': f'{day} 08:00:00',
+                'date_to': f'{day} 17:00:00',
+                'notes': 'load_simulator',
+            })
+        client.call('leaves', '/mobile/api/hr/leaves', {'limit': 20, 'count': 'none'})
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def report(stats, elapsed, sampler, output):
+    total = sum(len(latencies) for latencies in stats.latencies.values())
+    errors = sum(stats.errors.values())
+    summary = {
+        'duration_s': round(elapsed, 2),
+        'requests': total,
+        'errors': errors,
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0,
+        'steps': {},
+    }
+    print(f'{total} requests in {elapsed:.1f}s: {summary["throughput_rps"]} req/s, {errors} errors\n')
+    print(f'{"step":<20}{"count":>8}{"errors":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}')
+    for step, latencies in sorted(stats.latencies.items()):
+        figures = {
+            'count': len(latencies),
+            'errors': stats.errors[step],
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+            'max_ms': round(max(latencies) * 1000, 1),
+        }
+        summary['steps'][step] = figures
+        print(f'{step:<20}{figures["count"]:>8}{figures["errors"]:>8}{figures["p50_ms"]:>10}'
+              f'{figures["p95_ms"]:>10}{figures["p99_ms"]:>10}{figures["max_ms"]:>10}')
+
+    if sampler:
+        samples = sampler.samples or [0]
+        summary['lock_waits'] = {
+            'max_waiting_backends': max(samples),
+            'avg_waiting_backends': round(sum(samples) / len(samples), 2),
+            'longest_wait_s': round(sampler.max_wait, 2),
+            'deadlocks': sampler.deadlocks,
+        }
+        print('\nlock waits: max {max_waiting_backends} backends waiting, avg {avg_waiting_backends}, '
+              'longest {longest_wait_s}s, {deadlocks} deadlocks'.format(**summary['lock_waits']))
+
+    if output:
+        with open(output, 'w') as file:
+            json.dump(summary, file, indent=2)
+
+
+def run(args):
+    photo = None
+    if args.photo:
+        with open(args.photo, 'rb') as file:
+            photo = file.read()
+    else:
+        print('No --photo given: check-ins are sent without a photo', file=sys.stderr)
+
+    stats = Stats()
+    sampler = LockSampler(args.dsn) if args.dsn else None
+    if sampler:
+        sampler.start()
+    start = time.perf_counter()
+    # Arrivals are scheduled here rather than slept in the workers, so that a
+    # client waiting for its start does not hold one of the concurrency slots
+    arrivals = sorted((random.uniform(0, args.ramp_up), index) for index in range(args.users))
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = []
+        for arrival, index in arrivals:
+            time.sleep(max(0.0, start + arrival - time.perf_counter()))
+            futures.append(executor.submit(shift_start, index, args, stats, photo))
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+    if sampler:
+        sampler.stop()
+    report(stats, elapsed, sampler, args.output)
+
+
+def setup(args):
+    """Create the load test users, each with an employee and mobile HR access"""
+    common = xmlrpc.client.ServerProxy(f'{args.url}/xmlrpc/2/common')
+    uid = common.authenticate(args.db, args.admin_login, args.admin_password, {})
+    if not uid:
+        sys.exit('Administrator authentication failed')
+    models = xmlrpc.client.ServerProxy(f'{args.url}/xmlrpc/2/object', allow_none=True)
+
+    def execute(model, method, *method_args, **kwargs):
+        return models.execute_kw(args.db, uid, args.admin_password, model, method, list(method_args), kwargs)
+
+    group_ids = []
+    for xmlid in MOBILE_GROUPS:
+        module, name = xmlid.split('.')
+        group_ids += [data['res_id'] for data in execute(
+            'ir.model.data', 'search_read', [('module', '=', module), ('name', '=', name)], ['res_id'],
+        )]
+    logins = [USER_LOGIN.format(index) for index in range(args.users)]
+    existing = {user['login'] for user in execute('res.users', 'search_read', [('login', 'in', logins)], ['login'])}
+    missing = [login for login in logins if login not in existing]
+    for offset in range(0, len(missing), 200):
+        user_ids = execute('res.users', 'create', [{
+            'name': login,
+            'login': login,
+            'password': args.password,
+            'groups_id': [(6, 0, group_ids)],
+            'mobile_hr_access': True,
+        } for login in missing[offset:offset + 200]])
+        execute('hr.employee', 'create', [
+            {'name': login, 'user_id': user_id}
+            for login, user_id in zip(missing[offset:offset + 200], user_ids)
+        ])
+    print(f'{len(missing)} users created, {len(existing)} already present')
+
+
+def parse_think(value):
+    low, _, high = value.partition(':')
+    return float(low), float(high or low)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name in ('setup', 'run'):
+        subparser = subparsers.add_parser(name)
+        subparser.add_argument('--url', default='http://localhost:8069')
+        subparser.add_argument('--db', required=True)
+        subparser.add_argument('--users', type=int, default=100, help='number of simulated employees')
+        subparser.add_argument('--password', default=USER_PASSWORD, help='password of the load test users')
+
+    setup_parser = subparsers.choices['setup']
+    setup_parser.add_argument('--admin-login', default='admin')
+    setup_parser.add_argument('--admin-password', required=True)
+
+    run_parser = subparsers.choices['run']
+    run_parser.add_argument('--concurrency', type=int, default=50, help='clients running at the same time')
+    run_parser.add_argument('--ramp-up', type=float, default=10.0,
+                            help='seconds over which the clients open the app')
+    run_parser.add_argument('--think', type=parse_think, default=(0.5, 3.0),
+                            help='think time range in seconds, as MIN:MAX')
+    run_parser.add_argument('--leave-ratio', type=float, default=0.1,
+                            help='share of the clients submitting a leave request')
+    run_parser.add_argument('--photo', help='JPEG file sent with each check-in')
+    run_parser.add_argument('--dsn', help='psycopg2 DSN of the database, to sample lock waits')
+    run_parser.add_argument('--output', help='write the report as JSON to this file')
+
+    args = parser.parse_args()
+    if args.command == 'setup':
+        setup(args)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
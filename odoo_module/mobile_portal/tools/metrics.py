@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""In-process metrics of the mobile API routes
+
+Each worker process aggregates its own figures; the Prometheus exposition
+carries a ``pid`` label so that the series of several workers can be summed.
+"""
+
+import os
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def exposition(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.total}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class RouteMetrics:
+    __slots__ = ('duration', 'sql_queries', 'sql_duration', 'request_size', 'response_size', 'errors')
+
+    def __init__(self):
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.sql_queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.sql_duration = Histogram(LATENCY_BUCKETS)
+        self.request_size = Histogram(SIZE_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.errors = 0
+
+
+_lock = threading.Lock()
+_routes = defaultdict(RouteMetrics)
+
+HISTOGRAMS = (
+    ('duration', 'mobile_api_request_duration_seconds', 'Wall time of mobile API requests'),
+    ('sql_queries', 'mobile_api_sql_queries', 'SQL queries run per mobile API request'),
+    ('sql_duration', 'mobile_api_sql_duration_seconds', 'Time spent in SQL per mobile API request'),
+    ('request_size', 'mobile_api_request_bytes', 'Size of mobile API request bodies'),
+    ('response_size', 'mobile_api_response_bytes', 'Size of mobile API response bodies'),
+)
+
+
+def record(route, duration, sql_queries, sql_duration, request_size, response_size, error=False):
+    """Add the measures of one request to the histograms of its route"""
+    with _lock:
+        metrics = _routes[route]
+        metrics.duration.observe(duration)
+        metrics.sql_queries.observe(sql_queries)
+        metrics.sql_duration.observe(sql_duration)
+        metrics.request_size.observe(request_size)
+        metrics.response_size.observe(response_size)
+        if error:
+            metrics.errors += 1
+
+
+def exposition():
+    """Return the metrics of this process in the Prometheus text format"""
+    pid = os.getpid()
+    with _lock:
+        routes = sorted(_routes.items())
+        lines = []
+        for attribute, name, help_text in HISTOGRAMS:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for route, metrics in routes:
+                lines.extend(getattr(metrics, attribute).exposition(name, _labels(route, pid)))
+        lines.append('# HELP mobile_api_errors_total Mobile API requests that failed or returned an error')
+        lines.append('# TYPE mobile_api_errors_total counter')
+        for route, metrics in routes:
+            lines.append(f'mobile_api_errors_total{{{_labels(route, pid)}}} {metrics.errors}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+
+
+def _labels(route, pid):
+    escaped = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'route="{escaped}",pid="{pid}"'
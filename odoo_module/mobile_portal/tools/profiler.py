@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Capture of a cProfile dump and of the SQL trace of one slow call"""
+
+import cProfile
+import functools
+import marshal
+import threading
+import time
+
+# Statements kept per capture; the count and total time still cover all of them
+SQL_TRACE_MAX_QUERIES = 2000
+
+_local = threading.local()
+
+
+class Capture:
+    """Profile the current thread and record its SQL statements while active
+
+    Captures do not nest: a capture started while another one is running on
+    the same thread is inert, so a profiled route calling a profiled model
+    method yields a single record.
+    """
+
+    def __init__(self):
+        self.profile = None
+        self.queries = []
+        self.query_count = 0
+        self.query_time = 0.0
+        self.duration = 0.0
+
+    def __enter__(self):
+        if getattr(_local, 'capture', None):
+            return self
+        _local.capture = self
+        thread = threading.current_thread()
+        if not hasattr(thread, 'query_hooks'):
+            thread.query_hooks = []
+        thread.query_hooks.append(self._query_hook)
+        self.profile = cProfile.Profile()
+        self._start = time.perf_counter()
+        # query hooks receive time.time() based start times
+        self._start_time = time.time()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profile is None:
+            return
+        self.profile.disable()
+        self.duration = time.perf_counter() - self._start
+        threading.current_thread().query_hooks.remove(self._query_hook)
+        _local.capture = None
+
+    @property
+    def active(self):
+        return self.profile is not None
+
+    def _query_hook(self, cr, query, params, query_start, query_time):
+        self.query_count += 1
+        self.query_time += query_time
+        if len(self.queries) < SQL_TRACE_MAX_QUERIES:
+            self.queries.append((query_start - self._start_time, query_time, cr.mogrify(query, params)))
+
+    def get_sql_trace(self):
+        """Return the statements as text, one per block with its offset and duration in ms"""
+        return '\n\n'.join(
+            f'-- +{offset * 1000:.1f} ms, {duration * 1000:.2f} ms\n{_to_text(statement)}'
+            for offset, duration, statement in self.queries
+        )
+
+    def get_prof(self):
+        """Return the profile in the .prof format read by pstats and snakeviz"""
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+
+def is_capturing():
+    return bool(getattr(_local, 'capture', None))
+
+
+def _to_text(statement):
+    return statement.decode(errors='replace') if isinstance(statement, bytes) else str(statement)
+
+
+def profiled(method):
+    """Profile the calls of a model method matched by a mobile profiler rule
+
+    Calls are recorded under ``<model>.<method>``, e.g.
+    ``purchase.market.price.get_latest_prices``.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.env['mobile.profiler.rule']._run_profiled(
+            f'{self._name}.{method.__name__}', method, self, *args, **kwargs
+        )
+    return wrapper